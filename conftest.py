@@ -0,0 +1,75 @@
+import datetime as dt
+import os
+import sys
+from typing import Callable, Final, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The app imports its modules flat from proj/ (see the Procfile), so modules that
+# import their siblings need proj/ on the path under pytest too
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "proj"))
+
+SECTORS: Final = ["INDUSTRIAL", "FINANCIAL", "UTILITY"]
+UNIVERSE_COLUMNS: Final = [
+    "cusip",
+    "ticker",
+    "mat_dt",
+    "class_1",
+    "class_2",
+    "class_3",
+    "class_4",
+    "rating",
+    "dur_cell",
+    "oas",
+    "ytm",
+    "effdur",
+    "mv",
+]
+
+
+@pytest.fixture
+def make_universe() -> Callable[..., pd.DataFrame]:
+    """Builds random bond universes shaped like the bitmap index's; every column is
+    drawn whatever is asked for, so a seed gives the same bonds for any columns
+
+    Args (of the returned function):
+        n (int): number of bonds
+        rng (Union[int, np.random.Generator], optional): seed or generator. Defaults
+        to 0.
+        columns (Sequence[str], optional): columns wanted. Defaults to
+        UNIVERSE_COLUMNS.
+    """
+
+    def make(
+        n: int,
+        rng: Union[int, np.random.Generator] = 0,
+        columns: Sequence[str] = UNIVERSE_COLUMNS,
+    ) -> pd.DataFrame:
+        rng = np.random.default_rng(rng)
+        df = pd.DataFrame(
+            {
+                "cusip": [f"C{i:05d}" for i in range(n)],
+                "ticker": rng.choice(["AAPL", "JPM", "DUK", "XOM"], n),
+                "mat_dt": [
+                    (dt.date(2025, 1, 1) + dt.timedelta(days=int(x))).isoformat()
+                    for x in rng.integers(0, 3650, n)
+                ],
+                "class_1": "CORP",
+                "class_2": rng.choice(SECTORS, n),
+                "class_3": rng.choice(
+                    ["BANKING", "ENERGY", "ELECTRIC", "INSURANCE"], n
+                ),
+                "class_4": rng.choice(["A1", "B2", "C3"], n),
+                "rating": rng.choice(["AAA", "AA", "A", "BBB"], n),
+                "dur_cell": rng.choice(["0to3", "3to5", "5to8", "8to10"], n),
+                "oas": rng.uniform(20, 400, n),
+                "ytm": rng.uniform(0.5, 8, n),
+                "effdur": rng.uniform(0.5, 15, n),
+                "mv": rng.uniform(1e6, 1e8, n),
+            }
+        )
+        return df[list(columns)]
+
+    return make
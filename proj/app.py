@@ -1,24 +1,30 @@
 """This is the application module.
 """
+import datetime as dt
 import os
-from typing import Final
 
-import dash
 from dotenv import load_dotenv
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import distinct, select
 import dash_bootstrap_components as dbc
 
 from summaries import generate_summary_layout
 from callbacks import register_callbacks
-from db_structure import build_bond
+from db_structure import build_bond, build_portfolio_models
+from bitmap_index import BitmapIndex, universe_loader
+from data_catalog import DataCatalog, subscribe
+from exports import register_exports
+from portfolio_store import PortfolioStore, register_portfolio_routes
+from profiler import RequestProfiler
+from request_guard import RequestGuard
+from serialization import SerializingDash
 
 load_dotenv()
 
-# Create the dash app
+# Create the dash app; responses are encoded with orjson and compressed (see
+# serialization), with per-callback payload sizes at /payloads
 server = Flask(__name__)
-app = dash.Dash(
+app = SerializingDash(
     name=__name__,
     server=server,
     suppress_callback_exceptions=True,
@@ -33,37 +39,44 @@ if uri.startswith("postgres://"):
 app.server.config["SQLALCHEMY_DATABASE_URI"] = uri
 db = SQLAlchemy(app.server)
 Bond = build_bond(db)
-# We'll go ahead and process the unique values for all dropdowns here
-# Dates
-stmt = select(distinct(Bond.eff_date))
-dates = sorted([x[0] for x in db.session.execute(stmt)])
+# Dropdown values, refreshed per date as loads are announced (see data_catalog)
+catalog = DataCatalog(db, Bond)
+# A function rather than a fixed layout so every page load sees the current catalog
+app.layout = lambda: generate_summary_layout(*catalog.snapshot(), catalog.version)
+# Per-date universe and filter bitmaps, shared by the callbacks and exports
+bond_index = BitmapIndex(universe_loader(db, Bond))
 
-# Rating and dur_cell if sorted naturally (alphabetically) are really ugly; we'll
-# define a formal sort order for both and reference them. The ceaveat to that is
-# these would need to be maintained manually...
 
-# Ratings
-RATING_ORDER: Final = {"AAA": 0, "AA": 1, "A": 2, "BBB": 3}
-stmt = select(distinct(Bond.rating))
-ratings = sorted(
-    [x[0] for x in db.session.execute(stmt)], key=lambda y: RATING_ORDER[y]
-)
+def refresh_date(date_value: dt.date) -> None:
+    bond_index.invalidate(date_value)
+    catalog.refresh_date(date_value)
+
+
+def refresh_all() -> None:
+    bond_index.invalidate()
+    catalog.refresh()
 
-# Dur_cell
-DUR_CELL_ORDER: Final = {
-    "0to3": 0,
-    "3to5": 1,
-    "5to8": 2,
-    "8to10": 3,
-    "10to15": 4,
-    "15+": 5,
-}
-stmt = select(distinct(Bond.dur_cell))
-dur_cells = sorted(
-    [x[0] for x in db.session.execute(stmt)], key=lambda y: DUR_CELL_ORDER[y]
+
+data_subscriber = subscribe(
+    db, refresh_date, refresh_all, os.environ.get("DATA_MARKER_DIR")
+)
+# Solved portfolios, kept so runs can be reloaded and compared
+portfolio_store = PortfolioStore(db, *build_portfolio_models(db))
+portfolio_store.create_tables()
+register_callbacks(
+    app, db, Bond, bond_index, portfolio_store, catalog, RequestGuard(db)
 )
-app.layout = generate_summary_layout(dates, ratings, dur_cells)
-register_callbacks(app, db, Bond)
+register_exports(app.server, bond_index, catalog)
+register_portfolio_routes(app.server, portfolio_store)
+# Profiles requests slower than PROFILE_THRESHOLD_MS and, with PROFILE_ENABLED=1, those
+# sent with X-Profile or ?profile (see profiler); not installed when neither is set
+profile_threshold = os.environ.get("PROFILE_THRESHOLD_MS")
+app.server.config["PROFILE_ENABLED"] = os.environ.get("PROFILE_ENABLED") == "1"
+if app.server.config["PROFILE_ENABLED"] or profile_threshold is not None:
+    RequestProfiler(
+        os.environ.get("PROFILE_DIR", "profiles"),
+        None if profile_threshold is None else float(profile_threshold),
+    ).init_app(app.server, db.engine)
 
 if __name__ == "__main__":
     app.run_server(debug=True)
@@ -0,0 +1,173 @@
+"""This module holds the in-memory bitmap index over the bond universe. Each eff_date
+is loaded once into a DataFrame and every value of the filter dimensions gets a packed
+bitmap of the rows holding it, so any dropdown combination resolves to row ids with
+bitwise OR (within a dimension) and AND (across dimensions) instead of a query.
+"""
+
+import datetime as dt
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Final, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from flask_sqlalchemy import Model, SQLAlchemy
+from sqlalchemy import select
+
+DIMENSIONS: Final = ("class_1", "class_2", "class_3", "class_4", "rating", "dur_cell")
+NUMERIC_COLUMNS: Final = ("oas", "ytm", "effdur", "mv")
+UNIVERSE_COLUMNS: Final = ("cusip", "ticker", "mat_dt", *DIMENSIONS, *NUMERIC_COLUMNS)
+MAX_CACHED_DATES: Final = 16
+
+
+def as_date(date_value: Union[str, dt.date]) -> dt.date:
+    """Dash hands dates back from the browser as ISO strings; normalize them so cache
+    keys match the dates read from the database
+
+    Args:
+        date_value (Union[str, dt.date]): date or ISO formatted string
+
+    Returns:
+        dt.date: the date
+    """
+    if isinstance(date_value, dt.datetime):
+        return date_value.date()
+    if isinstance(date_value, dt.date):
+        return date_value
+    return dt.date.fromisoformat(str(date_value)[:10])
+
+
+class DateIndex:
+    """Universe for a single eff_date together with one packed bitmap per value of
+    every filter dimension
+    """
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        self.frame = frame.reset_index(drop=True)
+        self.num_rows = len(self.frame)
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for dim in DIMENSIONS:
+            codes, uniques = pd.factorize(self.frame[dim])
+            self.bitmaps[dim] = {
+                value: np.packbits(codes == i) for i, value in enumerate(uniques)
+            }
+        self._empty = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+
+    def values(self, dim: str) -> List[str]:
+        """Distinct values of a dimension on this date
+
+        Args:
+            dim (str): dimension, ex class_1
+
+        Returns:
+            List[str]: values in order of first appearance
+        """
+        return list(self.bitmaps[dim])
+
+    def resolve(self, filters: Dict[Optional[str], Optional[List[str]]]) -> np.ndarray:
+        """Row ids matching every filter; empty/None values or dimensions don't filter
+
+        Args:
+            filters (Dict[Optional[str], Optional[List[str]]]): dimension to the
+            values selected for it
+
+        Returns:
+            np.ndarray: sorted row positions into frame
+        """
+        mask = None
+        for dim, selected in filters.items():
+            if dim is None or not selected:
+                continue
+            dim_bitmaps = self.bitmaps[dim]
+            dim_mask = self._empty
+            for value in selected:
+                dim_mask = dim_mask | dim_bitmaps.get(value, self._empty)
+            mask = dim_mask if mask is None else mask & dim_mask
+        if mask is None:
+            return np.arange(self.num_rows)
+        return np.flatnonzero(np.unpackbits(mask, count=self.num_rows))
+
+    def select(self, filters: Dict[Optional[str], Optional[List[str]]]) -> pd.DataFrame:
+        """Rows of the universe matching every filter
+
+        Args:
+            filters (Dict[Optional[str], Optional[List[str]]]): see resolve
+
+        Returns:
+            pd.DataFrame: matching rows
+        """
+        return self.frame.iloc[self.resolve(filters)]
+
+
+class BitmapIndex:
+    """Lazily built, bounded cache of DateIndex objects keyed by eff_date; safe to
+    share between the threads of a worker
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[dt.date], pd.DataFrame],
+        max_dates: int = MAX_CACHED_DATES,
+    ) -> None:
+        self.loader = loader
+        self.max_dates = max_dates
+        self._indexes: "OrderedDict[dt.date, DateIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate so loads that straddle one aren't cached
+        self._generation = 0
+
+    def __getitem__(self, date_value: Union[str, dt.date]) -> DateIndex:
+        date_value = as_date(date_value)
+        with self._lock:
+            if date_value in self._indexes:
+                self._indexes.move_to_end(date_value)
+                return self._indexes[date_value]
+            generation = self._generation
+        # Load outside the lock so one slow date doesn't block the others
+        index = DateIndex(self.loader(date_value))
+        with self._lock:
+            if generation != self._generation:
+                return index
+            self._indexes[date_value] = index
+            self._indexes.move_to_end(date_value)
+            while len(self._indexes) > self.max_dates:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, date_value: Optional[Union[str, dt.date]] = None) -> None:
+        """Drops one date, or every date if none is given
+
+        Args:
+            date_value (Optional[Union[str, dt.date]], optional): date to drop.
+            Defaults to None.
+        """
+        with self._lock:
+            self._generation += 1
+            if date_value is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(as_date(date_value), None)
+
+
+def universe_loader(db: SQLAlchemy, Bond: Model) -> Callable[[dt.date], pd.DataFrame]:
+    """Builds the loader BitmapIndex uses to fetch one date of the universe
+
+    Args:
+        db (SQLAlchemy): sqlalchmey db object
+        Bond (Model): bond model
+
+    Returns:
+        Callable[[dt.date], pd.DataFrame]: function from eff_date to its bonds
+    """
+
+    def load(date_value: dt.date) -> pd.DataFrame:
+        stmt = select(*[getattr(Bond, x) for x in UNIVERSE_COLUMNS]).where(
+            Bond.eff_date == date_value
+        )
+        df = pd.DataFrame(list(db.session.execute(stmt)), columns=UNIVERSE_COLUMNS)
+        df["mat_dt"] = pd.to_datetime(df["mat_dt"], format="%m/%d/%Y").dt.date
+        for col in NUMERIC_COLUMNS:
+            df[col] = df[col].astype("float")
+        return df
+
+    return load
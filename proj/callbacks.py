@@ -8,17 +8,47 @@ from typing import Dict, Final, List, Optional, Tuple, Union
 import pandas as pd
 import dash_html_components as html
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 from dash_table import FormatTemplate
 from dash_table.Format import Format, Scheme
 from flask_sqlalchemy import Model, SQLAlchemy
-from dash_table import FormatTemplate
-from sqlalchemy import distinct, select, true
-from sqlalchemy.sql import func
-from itertools import chain
-from optimization import do_optimization
+from sqlalchemy import true
+from sqlalchemy.exc import SQLAlchemyError
+from optimization import SECTORS, do_optimization, parse_scenarios, run_scenarios
+from risk_model import FactorRiskModel
+from summary_stats import (
+    BREAKDOWN_DIMENSIONS,
+    MAX_BREAKDOWN_DIMENSIONS,
+    MEASURE_LABELS,
+    SUMMARY_MEASURES,
+    breakdown_tables,
+    summarize_arrays,
+    summary_figure,
+    summary_series_select,
+    summary_tables,
+    summarize_groups,
+)
+from bitmap_index import BitmapIndex, as_date
+from data_catalog import DUR_CELL_ORDER, RATING_ORDER, DataCatalog
+from portfolio_analytics import (
+    ANALYTICS_MEASURES,
+    TOP_HOLDINGS,
+    portfolio_analytics,
+    sector_tables,
+)
+from portfolio_store import PortfolioStore, diff_summary
+from request_guard import DEBOUNCE_SECONDS, RequestGuard
 
 
-def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
+def register_callbacks(
+    app,
+    db: SQLAlchemy,
+    Bond: Model,
+    bond_index: BitmapIndex,
+    portfolio_store: PortfolioStore,
+    catalog: DataCatalog,
+    request_guard: RequestGuard,
+) -> None:
     """Avoid circular importsby passing in the application, database, and bond model
     and create the callbacks from them (essentially a decorator pattern)
 
@@ -26,6 +56,10 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         app: dash dash application
         db (SQLAlchemy): sqlalchmey db object
         Bond (Model): bond model
+        bond_index (BitmapIndex): per-date universe and filter bitmaps
+        portfolio_store (PortfolioStore): saved optimization runs
+        catalog (DataCatalog): dropdown values, kept current as data loads
+        request_guard (RequestGuard): drops superseded filter-driven requests
 
     """
     # Quick dictionary to reduce conditional bond_object lookups
@@ -37,6 +71,42 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         None: [None, None],
     }
 
+    @app.callback(
+        (
+            Output("date_filter", "options"),
+            Output("rating_filter", "options"),
+            Output("dur_cell_filter", "options"),
+            Output("catalog_version", "data"),
+        ),
+        Input("catalog_poll", "n_intervals"),
+        State("catalog_version", "data"),
+    )
+    def refresh_catalog(
+        n_intervals: Optional[int], catalog_version: Optional[int]
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]], int]:
+        """Sends the dropdown options again only if a load changed them since the page
+        was served
+
+        Args:
+            n_intervals (Optional[int]): placeholder for the poll firing
+            catalog_version (Optional[int]): version the page was built from
+
+        Returns:
+            Tuple[List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]], int]:
+            date, rating and duration cell options and the new version
+        """
+        version = catalog.version
+        if catalog_version == version:
+            raise PreventUpdate
+        dates, ratings, dur_cells = catalog.snapshot()
+        return (
+            *[
+                [{"label": x, "value": x} for x in y]
+                for y in [dates, ratings, dur_cells]
+            ],
+            version,
+        )
+
     @app.callback(
         (
             Output("class_label", "children"),
@@ -65,12 +135,13 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         if class_type is None:
             return html.Label("Class value"), [], True, None
 
-        class_label, class_obj = CLASS_DICT[class_type]
-        stmt = select(distinct(class_obj)).where(Bond.eff_date == date_value)
-        result = db.session.execute(stmt)
+        class_label, _ = CLASS_DICT[class_type]
         return (
             class_label,
-            [{"label": x[0], "value": x[0]} for x in result],
+            [
+                {"label": x, "value": x}
+                for x in bond_index[date_value].values(class_type)
+            ],
             False,
             None,
         )
@@ -87,6 +158,7 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         Input("rating_filter", "value"),
         Input("dur_cell_filter", "value"),
         State("class_type", "value"),
+        State("session_id", "data"),
     )
     def update_summary_table(
         date_value: dt.datetime,
@@ -94,6 +166,7 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         rating_values: Optional[List[str]],
         dur_cell_values: Optional[List[str]],
         class_type: Optional[str],
+        session_id: Optional[str],
     ) -> Tuple[
         List[dict[str, Union[str, int]]],
         List[dict],
@@ -110,83 +183,134 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
             be none
             class_type (Optional[str]): class type, does not refresh upon change as
             the class value really determines a selection
+            session_id (Optional[str]): browser tab, for dropping superseded requests
 
         Returns:
             Tuple[ List[dict[str, Union[str, int]]], List[dict],
             List[dict[str, Union[str, int]]], List[dict], ]: [description]
         """
-        col_names = [
-            "Measure",
-            "Minimum",
-            "Average",
-            "Median",
-            "Maximum",
-        ]
+        seq = request_guard.begin(session_id, "summary_table")
+        index = bond_index[date_value]
+        # Loading a new date can take a while; skip the rest if it was superseded
+        request_guard.check(session_id, "summary_table", seq)
+        df = index.select(
+            {
+                class_type: class_values,
+                "rating": rating_values,
+                "dur_cell": dur_cell_values,
+            }
+        )
+        result = summarize_arrays(
+            {x: df[x].to_numpy() for x in ["mv", *SUMMARY_MEASURES]}
+        )
+        return summary_tables(result)
+
+    @app.callback(
+        (
+            Output("breakdown_table", "data"),
+            Output("breakdown_table", "columns"),
+            Output("breakdown_message", "children"),
+        ),
+        Input("date_filter", "value"),
+        Input("class_filter", "value"),
+        Input("rating_filter", "value"),
+        Input("dur_cell_filter", "value"),
+        Input("breakdown_dims", "value"),
+        State("class_type", "value"),
+        State("session_id", "data"),
+    )
+    def update_breakdown_table(
+        date_value: dt.datetime,
+        class_values: Optional[List[str]],
+        rating_values: Optional[List[str]],
+        dur_cell_values: Optional[List[str]],
+        dimensions: Optional[List[str]],
+        class_type: Optional[str],
+        session_id: Optional[str],
+    ) -> Tuple[List[Dict[str, Union[str, float, None]]], List[dict], str]:
+        """Summary statistics of every group of the chosen dimensions under the current
+        filters, all groups from one grouped pass over the cached universe
+
+        Args:
+            date_value (dt.datetime): date selected
+            class_values (Optional[List[str]]): class selected, may be none
+            rating_values (Optional[List[str]]): ratings values selected, may be none
+            dur_cell_values (Optional[List[str]]): duration cell values selected, may
+            be none
+            dimensions (Optional[List[str]]): dimensions to group by
+            class_type (Optional[str]): class type
+            session_id (Optional[str]): browser tab, for dropping superseded requests
+
+        Returns:
+            Tuple[List[Dict[str, Union[str, float, None]]], List[dict], str]: table
+            data and columns, and a message when too many dimensions are chosen
+        """
+        if not dimensions:
+            return [], [], ""
+        if len(dimensions) > MAX_BREAKDOWN_DIMENSIONS:
+            return [], [], f"Choose at most {MAX_BREAKDOWN_DIMENSIONS} dimensions"
+        seq = request_guard.begin(session_id, "breakdown_table")
+        index = bond_index[date_value]
+        request_guard.check(session_id, "breakdown_table", seq)
+        df = index.select(
+            {
+                class_type: class_values,
+                "rating": rating_values,
+                "dur_cell": dur_cell_values,
+            }
+        )
+        data, columns = breakdown_tables(
+            summarize_groups(df, dimensions),
+            dimensions,
+            {"rating": RATING_ORDER, "dur_cell": DUR_CELL_ORDER},
+        )
+        return data, columns, ""
+
+    @app.callback(
+        Output("summary_history", "figure"),
+        Input("class_filter", "value"),
+        Input("rating_filter", "value"),
+        Input("dur_cell_filter", "value"),
+        Input("history_measure", "value"),
+        State("class_type", "value"),
+        State("session_id", "data"),
+    )
+    def update_summary_history(
+        class_values: Optional[List[str]],
+        rating_values: Optional[List[str]],
+        dur_cell_values: Optional[List[str]],
+        measure: str,
+        class_type: Optional[str],
+        session_id: Optional[str],
+    ) -> dict:
+        """Chart the summary statistics of every date under the current filters; all
+        dates come back from one grouped query
+
+        Args:
+            class_values (Optional[List[str]]): class selected, may be none
+            rating_values (Optional[List[str]]): ratings values selected, may be none
+            dur_cell_values (Optional[List[str]]): duration cell values selected, may
+            be none
+            measure (str): measure to chart
+            class_type (Optional[str]): class type
+            session_id (Optional[str]): browser tab; rapid filter changes only run
+            the last query, and cancel the one still running
+
+        Returns:
+            dict: history figure
+        """
         _, class_obj = CLASS_DICT[class_type]
         where_clauses = [
-            Bond.eff_date == date_value,
             true()
             if any([class_obj is None, not class_values])
             else class_obj.in_(class_values),
             true() if not rating_values else Bond.rating.in_(rating_values),
             true() if not dur_cell_values else Bond.dur_cell.in_(dur_cell_values),
         ]
-        stmt = select(
-            func.min(Bond.oas),
-            func.avg(Bond.oas),
-            func.percentile_cont(0.5).within_group(Bond.oas.asc()),
-            func.max(Bond.oas),
-            func.min(Bond.ytm),
-            func.avg(Bond.ytm),
-            func.percentile_cont(0.5).within_group(Bond.ytm.asc()),
-            func.max(Bond.ytm),
-            func.sum(Bond.mv),
-            func.count(Bond.mv),
-        ).where(*where_clauses)
-        result = list(db.session.execute(stmt))[0]
-        return (
-            [
-                {
-                    "measure": "OAS",
-                    "minimum": result[0],
-                    "average": result[1],
-                    "median": result[2],
-                    "maximum": result[3],
-                },
-                {
-                    "measure": "YTM",
-                    "minimum": result[4],
-                    "average": result[5],
-                    "median": result[6],
-                    "maximum": result[7],
-                },
-            ],
-            [{"name": "Measure", "id": "measure"}]
-            + [
-                {
-                    "name": x,
-                    "id": x.lower(),
-                    "type": "numeric",
-                    "format": Format(precision=4, scheme=Scheme.fixed),
-                }
-                for x in col_names[1:]
-            ],
-            [{"num_bonds": result[9], "market_value": result[8]}],
-            [
-                {
-                    "name": "Number of bonds",
-                    "id": "num_bonds",
-                    "type": "numeric",
-                    "format": Format(group=","),
-                },
-                {
-                    "name": "Market value",
-                    "id": "market_value",
-                    "type": "numeric",
-                    "format": FormatTemplate.money(2),
-                },
-            ],
-        )
+        seq = request_guard.begin(session_id, "summary_history", DEBOUNCE_SECONDS)
+        with request_guard.statement(session_id, "summary_history", seq):
+            rows = list(db.session.execute(summary_series_select(Bond, where_clauses)))
+        return summary_figure(rows, measure)
 
     @app.callback(
         Output("opt_button", "disabled"),
@@ -240,6 +364,11 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
             Output("financials_results", "columns"),
             Output("utility_results", "columns"),
             Output("opt_summary", "columns"),
+            Output("opt_sensitivity", "data"),
+            Output("opt_sensitivity", "columns"),
+            Output("opt_characteristics", "data"),
+            Output("opt_contributions", "data"),
+            Output("opt_top_holdings", "data"),
         ),
         Input("opt_button", "n_clicks"),
         State("date_filter", "value"),
@@ -251,6 +380,8 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         State("sec_bound", "value"),
         State("duration_target", "value"),
         State("sector_limit", "value"),
+        State("risk_mode", "value"),
+        State("risk_cap", "value"),
     )
     def populate_optimization_results(
         n_clicks: Optional[int],
@@ -263,6 +394,8 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         sec_bound: float,
         duration_bound: float,
         sector_limit: float,
+        risk_mode: str,
+        risk_cap: Optional[float],
     ) -> Tuple[
         List[Dict[str, Union[str, float]]],
         List[Dict[str, Union[str, float]]],
@@ -272,6 +405,11 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
         List[dict],
         List[dict],
         List[dict],
+        List[Dict[str, Union[str, float, None]]],
+        List[dict],
+        List[Dict[str, Union[str, float, None]]],
+        List[Dict[str, Union[str, float]]],
+        List[Dict[str, Union[str, float]]],
     ]:
         """Reads inputs/filters to optimization routine and outputs to tables
 
@@ -286,9 +424,11 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
             sec_bound (float): single security weight constraint
             duration_bound (float): duration target
             sector_limit (float): sector limit constraint
+            risk_mode (str): none, volatility or tracking_error
+            risk_cap (Optional[float]): risk cap, bp per month
 
         Returns:
-            Tuple[ List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], List[dict], List[dict], List[dict], List[dict], ]: [description]
+            Tuple[ List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], List[dict], List[dict], List[dict], List[dict], List[Dict[str, Union[str, float, None]]], List[dict], List[Dict[str, Union[str, float, None]]], List[Dict[str, Union[str, float]]], List[Dict[str, Union[str, float]]], ]: [description]
         """
         wt_cols_names = ["cusip", "ticker", "mat_dt", "wt"]
         blanks = [{x: "--" for x in wt_cols_names}]
@@ -299,6 +439,29 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
                 ["Cusip", "Ticker", "Maturity date", "Weight"], wt_cols_names
             )
         ]
+        sensitivity_col_names = [
+            "constraint",
+            "rhs",
+            "slack",
+            "shadow_price",
+            "rhs_lower",
+            "rhs_upper",
+        ]
+        sensitivity_blanks = [{x: "--" for x in sensitivity_col_names}]
+        sensitivity_col_dicts = [
+            {"name": x, "id": y}
+            for x, y in zip(
+                [
+                    "Constraint",
+                    "Limit",
+                    "Slack",
+                    "Marginal value",
+                    "Valid from",
+                    "Valid to",
+                ],
+                sensitivity_col_names,
+            )
+        ]
         if n_clicks is None or n_clicks == 0:
             return (
                 [{x: "--" for x in ["opt_res", "cash_wt"]}],
@@ -312,30 +475,22 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
                     {"name": "Result", "id": "opt_res"},
                     {"name": "Cash weight", "id": "cash_wt"},
                 ],
+                sensitivity_blanks,
+                sensitivity_col_dicts,
+                [],
+                [],
+                [],
             )
         # Rescale sector limit to be a percentage
         sector_limit = sector_limit / 100
-        _, class_obj = CLASS_DICT[class_type]
-        where_clauses = [
-            Bond.eff_date == date_value,
-            true()
-            if any([class_obj is None, not class_values])
-            else class_obj.in_(class_values),
-            true() if not rating_values else Bond.rating.in_(rating_values),
-            true() if not dur_cell_values else Bond.dur_cell.in_(dur_cell_values),
-        ]
-        stmt = select(
-            Bond.cusip,
-            Bond.oas,
-            Bond.ytm,
-            Bond.class_2,
-            Bond.effdur,
-            Bond.mat_dt,
-            Bond.ticker,
-        ).where(*where_clauses)
-        try:
-            result = list(db.session.execute(stmt))
-        except IndexError:
+        df = bond_index[date_value].select(
+            {
+                class_type: class_values,
+                "rating": rating_values,
+                "dur_cell": dur_cell_values,
+            }
+        )
+        if df.empty:
             return (
                 [{"opt_res": "0", "cash_wt": 1}],
                 blanks,
@@ -348,18 +503,20 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
                     {"name": "Result", "id": "opt_res"},
                     {"name": "Cash weight", "id": "cash_wt", "format": percentage},
                 ],
+                sensitivity_blanks,
+                sensitivity_col_dicts,
+                [],
+                [],
+                [],
             )
-        df = pd.DataFrame(
-            result,
-            columns=["cusip", "oas", "ytm", "class_2", "effdur", "mat_dt", "ticker"],
-        )
-        df["mat_dt"] = pd.to_datetime(df["mat_dt"], format="%m/%d/%Y").dt.date
-        df["oas"] = df["oas"].astype("float")
-        df["ytm"] = df["ytm"].astype("float")
-        df["effdur"] = df["effdur"].astype("float")
         industrial_df = df[df["class_2"] == "INDUSTRIAL"]
         financial_df = df[df["class_2"] == "FINANCIAL"]
         utility_df = df[df["class_2"] == "UTILITY"]
+        risk_model = None
+        if risk_mode != "none" and risk_cap is not None:
+            risk_model = FactorRiskModel.from_universe(
+                pd.concat([industrial_df, financial_df, utility_df])
+            )
 
         opt_results = do_optimization(
             industrial_df,
@@ -369,6 +526,9 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
             duration_bound,
             sector_limit,
             opt_metric,
+            risk_model=risk_model,
+            risk_cap=risk_cap,
+            tracking_error=risk_mode == "tracking_error",
         )
         if opt_results is None:
             return (
@@ -383,44 +543,62 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
                     {"name": "Result", "id": "opt_res"},
                     {"name": "Cash weight", "id": "cash_wt"},
                 ],
+                sensitivity_blanks,
+                sensitivity_col_dicts,
+                [],
+                [],
+                [],
             )
-        res_max, cusip_wts = opt_results
-        cusip_wts = pd.DataFrame(cusip_wts, columns=["cusip", "wts"]).set_index("cusip")
-
-        def get_sector_wts(
-            sector_df: pd.DataFrame,
-        ) -> pd.DataFrame:
-            res_df: pd.DataFrame = (
-                sector_df.set_index("cusip")
-                .join(cusip_wts)[["ticker", "mat_dt", "wts"]]
-                .query("""wts > 0""")
-                .sort_values(
-                    ["wts", "ticker", "mat_dt"], ascending=[False, True, False]
-                )
-                .reset_index()
-            )
-            return res_df.append(
-                pd.Series(
-                    ["--", "--", "Total", res_df["wts"].sum()], index=res_df.columns
-                ),
-                ignore_index=True,
+        res_max, cusip_wts, sensitivity, reduced_costs = opt_results
+        # Every solve is stored, but a failed write mustn't hide its results
+        try:
+            run_id = portfolio_store.save_run(
+                as_date(date_value),
+                {
+                    x: y
+                    for x, y in [
+                        (class_type, class_values),
+                        ("rating", rating_values),
+                        ("dur_cell", dur_cell_values),
+                    ]
+                    if x is not None
+                },
+                opt_metric,
+                sec_bound,
+                duration_bound,
+                sector_limit,
+                res_max,
+                cusip_wts,
+                risk_mode,
+                risk_cap if risk_model is not None else None,
             )
-
-        industrial_res, financial_res, utility_res = [
-            get_sector_wts(sector_df)
-            for sector_df in [industrial_df, financial_df, utility_df]
-        ]
-
-        cash_wt = 1 - (
-            industrial_res.iloc[-1]["wts"]
-            + financial_res.iloc[-1]["wts"]
-            + utility_res.iloc[-1]["wts"]
+        except SQLAlchemyError:
+            app.server.logger.exception("Could not save the optimization run")
+            run_id = None
+        # One pass from solver weights to every result table
+        analytics = portfolio_analytics(
+            df,
+            cusip_wts,
+            SECTORS,
+            orders={"rating": RATING_ORDER, "dur_cell": DUR_CELL_ORDER},
         )
+        industrial_res, financial_res, utility_res = sector_tables(analytics, SECTORS)
+        # Objective gained per unit of a bond's own weight limit; blank on the totals
+        reduced_costs = dict(reduced_costs)
+        for res in [industrial_res, financial_res, utility_res]:
+            res["reduced_cost"] = res["cusip"].map(reduced_costs)
+        cash_wt = analytics.cash_wt
         non_blank_cols = [
             {"name": "Cusip", "id": "cusip"},
             {"name": "Ticker", "id": "ticker"},
             {"name": "Maturity date", "id": "mat_dt"},
             {"name": "Weight", "id": "wts", "type": "numeric", "format": percentage},
+            {
+                "name": "Reduced cost",
+                "id": "reduced_cost",
+                "type": "numeric",
+                "format": Format(precision=2, scheme=Scheme.fixed),
+            },
         ]
 
         def _nice_data_values(df: pd.DataFrame) -> pd.DataFrame:
@@ -450,7 +628,7 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
             return wt_col_dicts if df.empty else non_blank_cols
 
         return (
-            [{"opt_res": res_max, "cash_wt": cash_wt}],
+            [{"opt_res": res_max, "cash_wt": cash_wt, "run_id": run_id}],
             *[
                 _nice_data_values(x)
                 for x in [industrial_res, financial_res, utility_res]
@@ -469,5 +647,173 @@ def register_callbacks(app, db: SQLAlchemy, Bond: Model) -> None:
                     "type": "numeric",
                     "format": percentage,
                 },
+                {"name": "Run", "id": "run_id"},
+            ],
+            sensitivity,
+            [sensitivity_col_dicts[0]]
+            + [
+                {
+                    **col,
+                    "type": "numeric",
+                    "format": Format(precision=4, scheme=Scheme.fixed),
+                }
+                for col in sensitivity_col_dicts[1:]
             ],
+            [
+                {"measure": MEASURE_LABELS[x], "value": y}
+                for x, y in analytics.characteristics.items()
+            ],
+            analytics.contributions.assign(
+                dimension=analytics.contributions["dimension"].map(BREAKDOWN_DIMENSIONS)
+            ).to_dict("records"),
+            analytics.holdings.head(TOP_HOLDINGS)[
+                ["cusip", "ticker", "class_2", "rating", "wts", *ANALYTICS_MEASURES]
+            ].to_dict("records"),
+        )
+
+    @app.callback(
+        (
+            Output("scenario_results", "data"),
+            Output("scenario_results", "columns"),
+            Output("scenario_message", "children"),
+        ),
+        Input("scenario_button", "n_clicks"),
+        State("date_filter", "value"),
+        State("class_type", "value"),
+        State("class_filter", "value"),
+        State("rating_filter", "value"),
+        State("dur_cell_filter", "value"),
+        State("opt_metric", "value"),
+        State("sec_bound", "value"),
+        State("duration_target", "value"),
+        State("sector_limit", "value"),
+        State("scenario_text", "value"),
+    )
+    def populate_scenario_results(
+        n_clicks: Optional[int],
+        date_value: dt.date,
+        class_type: str,
+        class_values: Optional[List[str]],
+        rating_values: Optional[List[str]],
+        dur_cell_values: Optional[List[str]],
+        opt_metric: str,
+        sec_bound: float,
+        duration_bound: float,
+        sector_limit: float,
+        scenario_text: Optional[str],
+    ) -> Tuple[List[Dict[str, Union[str, float, None]]], List[dict], str]:
+        """Re-runs the optimization under every spread scenario at once
+
+        Args:
+            n_clicks (Optional[int]): placeholder for checking if button is clicked
+            date_value (dt.date): date selected
+            class_type (str): class selected
+            class_values (Optional[List[str]]): class values
+            rating_values (Optional[List[str]]): ratings values
+            dur_cell_values (Optional[List[str]]): duration cell values
+            opt_metric (str): optimization metric
+            sec_bound (float): single security weight constraint
+            duration_bound (float): duration target
+            sector_limit (float): sector limit constraint, percentage
+            scenario_text (Optional[str]): scenario definitions, one per line
+
+        Returns:
+            Tuple[List[Dict[str, Union[str, float, None]]], List[dict], str]: scenario
+            table data and columns, and a message for unreadable scenarios
+        """
+        if n_clicks is None or n_clicks == 0 or None in (duration_bound, sector_limit):
+            return [], [], ""
+        index = bond_index[date_value]
+        try:
+            scenarios = parse_scenarios(
+                scenario_text or "", index.values("class_2") + index.values("rating")
+            )
+        except ValueError as e:
+            return [], [], str(e)
+        df = index.select(
+            {
+                class_type: class_values,
+                "rating": rating_values,
+                "dur_cell": dur_cell_values,
+            }
+        )
+        results = run_scenarios(
+            df, scenarios, sec_bound, duration_bound, sector_limit / 100, opt_metric
+        )
+        percentage = FormatTemplate.percentage(2)
+        fixed = Format(precision=4, scheme=Scheme.fixed)
+        names = {
+            "scenario": "Scenario",
+            "status": "Status",
+            "objective": "Result",
+            "objective_change": "Change vs base",
+            "oas": "OAS",
+            "ytm": "YTM",
+            "effdur": "Duration",
+            "cash_wt": "Cash weight",
+            "holdings": "Holdings",
+            "industrial_wt": "Industrial weight",
+            "financial_wt": "Financial weight",
+            "utility_wt": "Utility weight",
+            "turnover": "Turnover vs base",
+        }
+        columns = [
+            {"name": names[x], "id": x}
+            if x in ("scenario", "status", "holdings")
+            else {
+                "name": names[x],
+                "id": x,
+                "type": "numeric",
+                "format": percentage if x.endswith("wt") or x == "turnover" else fixed,
+            }
+            for x in results.columns
+        ]
+        # Infeasible scenarios have no metrics; blank rather than NaN in the table
+        records = results.astype(object).where(results.notna(), None)
+        return records.to_dict("records"), columns, ""
+
+    @app.callback(
+        [
+            Output("diff_results", "data"),
+            Output("diff_results", "columns"),
+            Output("diff_message", "children"),
+        ],
+        Input("diff_button", "n_clicks"),
+        State("diff_old_run", "value"),
+        State("diff_new_run", "value"),
+    )
+    def populate_run_diff(
+        n_clicks: Optional[int], old_id: Optional[int], new_id: Optional[int]
+    ) -> Tuple[List[Dict[str, Union[str, float]]], List[dict], str]:
+        """Position changes between two saved optimization runs
+
+        Args:
+            n_clicks (Optional[int]): placeholder for checking if button is clicked
+            old_id (Optional[int]): earlier run
+            new_id (Optional[int]): later run
+
+        Returns:
+            Tuple[List[Dict[str, Union[str, float]]], List[dict], str]: diff table
+            data and columns, and a one line summary or error
+        """
+        if n_clicks is None or n_clicks == 0 or None in (old_id, new_id):
+            return [], [], ""
+        try:
+            diff = portfolio_store.diff_runs(int(old_id), int(new_id))
+        except KeyError as e:
+            return [], [], f"No portfolio run {e.args[0]}"
+        percentage = FormatTemplate.percentage(2)
+        columns = [{"name": "Cusip", "id": "cusip"}, {"name": "Status", "id": "status"}]
+        columns += [
+            {"name": x, "id": y, "type": "numeric", "format": percentage}
+            for x, y in zip(
+                ["Earlier weight", "Later weight", "Change"],
+                ["wt_old", "wt_new", "change"],
+            )
+        ]
+        counts = diff_summary(diff)
+        message = (
+            "{added} added, {removed} removed, {resized} resized, {unchanged} "
+            "unchanged; turnover {turnover:.2%}".format(**counts)
         )
+        return diff.to_dict("records"), columns, message
@@ -0,0 +1,313 @@
+"""This module keeps the dropdown catalogs (dates, ratings, duration cells) current
+while the app is running. The load in queries.sql fires a NOTIFY on DATA_CHANNEL for
+every eff_date it touches; each worker LISTENs for those and refreshes only that date,
+both in the catalog and in whatever per-date caches it holds. Without Postgres a
+directory of marker files, one per date, stands in for the channel, ex
+
+    python data_catalog.py 2020-02-29 --marker-dir /tmp/bond_events
+"""
+
+import argparse
+import datetime as dt
+import os
+import select
+import threading
+import zlib
+from typing import Callable, Dict, Final, List, Optional, Sequence, Set, Tuple
+
+from flask_sqlalchemy import Model, SQLAlchemy
+from sqlalchemy import create_engine, select as sql_select, text
+from sqlalchemy.engine import Engine
+
+DATA_CHANNEL: Final = "bond_dates"
+# Rating and dur_cell if sorted naturally (alphabetically) are really ugly; we'll
+# define a formal sort order for both and reference them. Values missing from these
+# sort last, so a new bucket in a load shows up rather than breaking the app
+RATING_ORDER: Final = {"AAA": 0, "AA": 1, "A": 2, "BBB": 3}
+DUR_CELL_ORDER: Final = {
+    "0to3": 0,
+    "3to5": 1,
+    "5to8": 2,
+    "8to10": 3,
+    "10to15": 4,
+    "15+": 5,
+}
+LISTEN_TIMEOUT: Final = 5.0
+MAX_RECONNECT_WAIT: Final = 60.0
+MARKER_POLL_INTERVAL: Final = 2.0
+
+
+def ordered(values: Sequence[str], order: Dict[str, int]) -> List[str]:
+    """Sorts values by a formal order; unknown values go last, alphabetically
+
+    Args:
+        values (Sequence[str]): values to sort
+        order (Dict[str, int]): value to its rank
+
+    Returns:
+        List[str]: sorted values
+    """
+    return sorted(values, key=lambda x: (order.get(x, len(order)), x))
+
+
+class DataCatalog:
+    """Distinct ratings and duration cells of every eff_date, kept per date so a
+    reload of one date is a single small query; safe to share between threads
+    """
+
+    def __init__(self, db: SQLAlchemy, Bond: Model) -> None:
+        self.db = db
+        self.Bond = Bond
+        self.version = 0
+        self._dates: Dict[dt.date, Tuple[Set[str], Set[str]]] = {}
+        self._snapshot: Tuple[List[dt.date], List[str], List[str]] = ([], [], [])
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Rebuilds every date in one pass; used at start up and after missed events"""
+        stmt = sql_select(self.Bond.eff_date, self.Bond.rating, self.Bond.dur_cell)
+        dates: Dict[dt.date, Tuple[Set[str], Set[str]]] = {}
+        for date_value, rating, dur_cell in self.db.session.execute(stmt.distinct()):
+            ratings, dur_cells = dates.setdefault(date_value, (set(), set()))
+            ratings.add(rating)
+            dur_cells.add(dur_cell)
+        self.db.session.remove()
+        with self._lock:
+            self._dates = dates
+            self._publish()
+
+    def refresh_date(self, date_value: dt.date) -> None:
+        """Re-reads one date; a date with no rows left is dropped
+
+        Args:
+            date_value (dt.date): date that was (re)loaded or deleted
+        """
+        stmt = sql_select(self.Bond.rating, self.Bond.dur_cell).where(
+            self.Bond.eff_date == date_value
+        )
+        rows = list(self.db.session.execute(stmt.distinct()))
+        self.db.session.remove()
+        with self._lock:
+            if rows:
+                self._dates[date_value] = (
+                    {x[0] for x in rows},
+                    {x[1] for x in rows},
+                )
+            else:
+                self._dates.pop(date_value, None)
+            self._publish()
+
+    def _publish(self) -> None:
+        """Rebuilds the dropdown values; the version is a checksum of them rather than
+        a counter so every worker agrees on it and browsers only refresh on change
+        """
+        ratings = set().union(*[x[0] for x in self._dates.values()])
+        dur_cells = set().union(*[x[1] for x in self._dates.values()])
+        self._snapshot = (
+            sorted(self._dates),
+            ordered(ratings, RATING_ORDER),
+            ordered(dur_cells, DUR_CELL_ORDER),
+        )
+        self.version = zlib.crc32(repr(self._snapshot).encode())
+
+    def snapshot(self) -> Tuple[List[dt.date], List[str], List[str]]:
+        """Dropdown values as of now
+
+        Returns:
+            Tuple[List[dt.date], List[str], List[str]]: dates, ratings and duration
+            cells, each in display order
+        """
+        with self._lock:
+            return self._snapshot
+
+
+class _Subscriber(threading.Thread):
+    """Daemon thread calling on_date for every date event and on_missed whenever
+    events may have been lost (reconnects), until stop is called
+    """
+
+    def __init__(
+        self,
+        on_date: Callable[[dt.date], None],
+        on_missed: Callable[[], None],
+    ) -> None:
+        super().__init__(daemon=True)
+        self.on_date = on_date
+        self.on_missed = on_missed
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            date_value = dt.date.fromisoformat(payload.strip()[:10])
+        except ValueError:
+            return
+        self.on_date(date_value)
+
+
+class PostgresSubscriber(_Subscriber):
+    """LISTENs on DATA_CHANNEL over its own connection, outside the session pool"""
+
+    def __init__(
+        self,
+        db: SQLAlchemy,
+        on_date: Callable[[dt.date], None],
+        on_missed: Callable[[], None],
+        channel: str = DATA_CHANNEL,
+    ) -> None:
+        super().__init__(on_date, on_missed)
+        self.db = db
+        self.channel = channel
+
+    def run(self) -> None:
+        wait = 1.0
+        connected_before = False
+        while not self._stop_event.is_set():
+            try:
+                connection = self.db.engine.raw_connection()
+                try:
+                    dbapi_connection = connection.connection
+                    dbapi_connection.autocommit = True
+                    cursor = dbapi_connection.cursor()
+                    cursor.execute(f"LISTEN {self.channel}")
+                    if connected_before:
+                        self.on_missed()
+                    connected_before, wait = True, 1.0
+                    self._listen(dbapi_connection)
+                finally:
+                    connection.invalidate()
+            except Exception:
+                # Database restarts, dropped connections; back off and resubscribe
+                self._stop_event.wait(wait)
+                wait = min(2 * wait, MAX_RECONNECT_WAIT)
+
+    def _listen(self, dbapi_connection) -> None:
+        while not self._stop_event.is_set():
+            if not select.select([dbapi_connection], [], [], LISTEN_TIMEOUT)[0]:
+                continue
+            dbapi_connection.poll()
+            # A multi-date load notifies once per date; refresh each of them once
+            payloads = {x.payload for x in dbapi_connection.notifies}
+            dbapi_connection.notifies.clear()
+            for payload in sorted(payloads):
+                self._dispatch(payload)
+
+
+class MarkerSubscriber(_Subscriber):
+    """Polls a directory holding one marker file per date, named by its ISO date;
+    a new or touched file is an event for that date
+    """
+
+    def __init__(
+        self,
+        marker_dir: str,
+        on_date: Callable[[dt.date], None],
+        on_missed: Callable[[], None],
+        interval: float = MARKER_POLL_INTERVAL,
+    ) -> None:
+        super().__init__(on_date, on_missed)
+        self.marker_dir = marker_dir
+        self.interval = interval
+        self._seen = self._scan()
+
+    def _scan(self) -> Dict[str, int]:
+        try:
+            with os.scandir(self.marker_dir) as entries:
+                return {x.name: x.stat().st_mtime_ns for x in entries if x.is_file()}
+        except FileNotFoundError:
+            return {}
+
+    def poll(self) -> None:
+        """Dispatches every marker created or touched since the last poll"""
+        seen = self._scan()
+        for name, mtime in sorted(seen.items()):
+            if self._seen.get(name) != mtime:
+                self._dispatch(name)
+        self._seen = seen
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                # Keep polling; the next pass retries whatever this one missed
+                continue
+
+
+def notify_date(
+    date_value: dt.date,
+    engine: Optional[Engine] = None,
+    marker_dir: Optional[str] = None,
+) -> None:
+    """Announces a (re)loaded date to every worker; the trigger in queries.sql does this
+    for loads into main_table, this is for anything that bypasses it
+
+    Args:
+        date_value (dt.date): loaded date
+        engine (Optional[Engine], optional): Postgres engine to NOTIFY through.
+        Defaults to None.
+        marker_dir (Optional[str], optional): marker directory to touch instead.
+        Defaults to None.
+    """
+    if marker_dir is not None:
+        os.makedirs(marker_dir, exist_ok=True)
+        path = os.path.join(marker_dir, date_value.isoformat())
+        with open(path, "a"):
+            pass
+        os.utime(path)
+    if engine is not None:
+        with engine.begin() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": DATA_CHANNEL, "payload": date_value.isoformat()},
+            )
+
+
+def subscribe(
+    db: SQLAlchemy,
+    on_date: Callable[[dt.date], None],
+    on_missed: Callable[[], None],
+    marker_dir: Optional[str] = None,
+) -> Optional[_Subscriber]:
+    """Starts the subscriber this deployment supports: markers if a directory is
+    given, LISTEN on Postgres, otherwise none
+
+    Args:
+        db (SQLAlchemy): sqlalchmey db object
+        on_date (Callable[[dt.date], None]): called with every (re)loaded date
+        on_missed (Callable[[], None]): called when events may have been missed
+        marker_dir (Optional[str], optional): marker directory. Defaults to None.
+
+    Returns:
+        Optional[_Subscriber]: the running subscriber, if any
+    """
+    if marker_dir is not None:
+        subscriber = MarkerSubscriber(marker_dir, on_date, on_missed)
+    elif db.engine.dialect.name == "postgresql":
+        subscriber = PostgresSubscriber(db, on_date, on_missed)
+    else:
+        return None
+    subscriber.start()
+    return subscriber
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Announce (re)loaded eff_dates")
+    parser.add_argument("dates", nargs="+", type=dt.date.fromisoformat)
+    parser.add_argument("--marker-dir", default=os.environ.get("DATA_MARKER_DIR"))
+    args = parser.parse_args(argv)
+    engine = None
+    if args.marker_dir is None:
+        uri = os.environ.get("DATABASE_URL")
+        if uri.startswith("postgres://"):
+            uri = uri.replace("postgres://", "postgresql://", 1)
+        engine = create_engine(uri)
+    for date_value in args.dates:
+        notify_date(date_value, engine, args.marker_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 """This module connects the code for connecting to the PostgreSql server."""
+from typing import Tuple
+
 from flask_sqlalchemy import Model, SQLAlchemy
 
 
@@ -58,3 +60,44 @@ def build_bond(db: SQLAlchemy) -> Model:
             self.mat_dt = mat_dt
 
     return Bond
+
+
+def build_portfolio_models(db: SQLAlchemy) -> Tuple[Model, Model]:
+    class PortfolioRun(db.Model):
+        """
+        One solved optimization: the filters and parameters it was run with and its
+        objective
+
+        """
+
+        __tablename__ = "portfolio_run"
+        run_id = db.Column(db.Integer, primary_key=True)
+        created_at = db.Column(db.DateTime, nullable=False, index=True)
+        eff_date = db.Column(db.Date, nullable=False)
+        filters = db.Column(db.JSON, nullable=False)
+        metric = db.Column(db.String, nullable=False)
+        # None when the run had no per-security cap
+        security_bound = db.Column(db.Float)
+        duration_target = db.Column(db.Float, nullable=False)
+        sector_bound = db.Column(db.Float, nullable=False)
+        risk_mode = db.Column(db.String, nullable=False)
+        risk_cap = db.Column(db.Float)
+        objective = db.Column(db.Float, nullable=False)
+
+    class PortfolioHolding(db.Model):
+        """
+        Non-zero weights of a run; the primary key doubles as the index runs are
+        loaded through
+
+        """
+
+        __tablename__ = "portfolio_holding"
+        run_id = db.Column(
+            db.Integer,
+            db.ForeignKey("portfolio_run.run_id", ondelete="CASCADE"),
+            primary_key=True,
+        )
+        cusip = db.Column(db.String, primary_key=True)
+        wt = db.Column(db.Float, nullable=False)
+
+    return PortfolioRun, PortfolioHolding
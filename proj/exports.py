@@ -0,0 +1,212 @@
+"""This module registers the download endpoints on the flask server. Filtered universes
+and optimized portfolios are streamed back in fixed size chunks of CSV or Parquet so
+large extracts never have to be serialized in one piece; a universe export slices each
+chunk straight out of the cached universe by the row ids of the filters rather than
+copying the filtered universe first. Only dates in the data catalog are exported, so
+arbitrary dates don't load, or take cache slots in, the bitmap index.
+"""
+
+import io
+from typing import Dict, Final, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Flask, Response, abort, request, stream_with_context
+
+from bitmap_index import BitmapIndex, DateIndex, as_date
+from data_catalog import DataCatalog
+from optimization import do_optimization
+
+EXPORT_CHUNK_ROWS: Final = 10_000
+EXPORT_FORMATS: Final = {
+    "csv": "text/csv",
+    "parquet": "application/octet-stream",
+}
+PORTFOLIO_COLUMNS: Final = [
+    "cusip",
+    "ticker",
+    "mat_dt",
+    "class_2",
+    "rating",
+    "dur_cell",
+    "oas",
+    "ytm",
+    "effdur",
+    "wt",
+]
+
+
+class _DrainableBuffer(io.RawIOBase):
+    """Write-only file the parquet writer can target; whatever has been written so far
+    is handed out, and forgotten, by drain
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def csv_chunks(df: pd.DataFrame, rows: Optional[np.ndarray] = None) -> Iterator[bytes]:
+    """Encodes rows of a DataFrame as CSV, EXPORT_CHUNK_ROWS rows at a time
+
+    Args:
+        df (pd.DataFrame): data to encode
+        rows (Optional[np.ndarray], optional): positions of the rows to encode, in
+        order. Defaults to None, every row.
+
+    Yields:
+        Iterator[bytes]: header and rows, in order
+    """
+    rows = np.arange(len(df)) if rows is None else rows
+    for start in range(0, max(len(rows), 1), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[rows[start : start + EXPORT_CHUNK_ROWS]]
+        yield chunk.to_csv(index=False, header=start == 0).encode()
+
+
+def parquet_chunks(
+    df: pd.DataFrame, rows: Optional[np.ndarray] = None
+) -> Iterator[bytes]:
+    """Encodes rows of a DataFrame as a Parquet file with one row group per
+    EXPORT_CHUNK_ROWS rows, yielding each row group as soon as it is written
+
+    Args:
+        df (pd.DataFrame): data to encode
+        rows (Optional[np.ndarray], optional): positions of the rows to encode, in
+        order. Defaults to None, every row.
+
+    Yields:
+        Iterator[bytes]: consecutive pieces of the file
+    """
+    rows = np.arange(len(df)) if rows is None else rows
+    sink = _DrainableBuffer()
+    # From the leading rows of the whole frame, so every filter gets the same types
+    schema = pa.Schema.from_pandas(df.head(EXPORT_CHUNK_ROWS), preserve_index=False)
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+            chunk = df.iloc[rows[start : start + EXPORT_CHUNK_ROWS]]
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def register_exports(
+    server: Flask, bond_index: BitmapIndex, catalog: DataCatalog
+) -> None:
+    """Adds the /export routes to the flask server
+
+    Args:
+        server (Flask): server underlying the dash application
+        bond_index (BitmapIndex): per-date universe shared with the callbacks
+        catalog (DataCatalog): dates that can be exported
+    """
+
+    def _request_filters() -> Dict[Optional[str], Optional[List[str]]]:
+        """Same filters as the dropdowns; multi-selects are repeated query parameters,
+        ex ?rating=AA&rating=A
+        """
+        return {
+            request.args.get("class_type"): request.args.getlist("class"),
+            "rating": request.args.getlist("rating"),
+            "dur_cell": request.args.getlist("dur_cell"),
+        }
+
+    def _selection() -> Tuple[DateIndex, np.ndarray]:
+        """Universe of the requested date and the row ids matching the filters"""
+        date_value = request.args.get("date")
+        if date_value is None:
+            abort(400, "date is required")
+        try:
+            date_value = as_date(date_value)
+        except ValueError:
+            abort(400, "Invalid date")
+        if date_value not in catalog.snapshot()[0]:
+            abort(404, f"No data for {date_value}")
+        index = bond_index[date_value]
+        try:
+            return index, index.resolve(_request_filters())
+        except KeyError:
+            abort(400, "Invalid filters")
+
+    def _stream(
+        df: pd.DataFrame, name: str, rows: Optional[np.ndarray] = None
+    ) -> Response:
+        export_format = request.args.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            abort(400, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        encode = csv_chunks if export_format == "csv" else parquet_chunks
+        chunks = encode(df, rows)
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={
+                "Content-Disposition": f"attachment; filename={name}.{export_format}"
+            },
+        )
+
+    @server.route("/export/universe")
+    def export_universe() -> Response:
+        """Streams the bonds behind the summary for the requested filters"""
+        index, rows = _selection()
+        return _stream(index.frame, "universe", rows)
+
+    @server.route("/export/portfolio")
+    def export_portfolio() -> Response:
+        """Solves the optimization for the requested filters and parameters and streams
+        the bonds held with their weights
+        """
+        metric = request.args.get("metric", "oas")
+        sec_bound = request.args.get("sec_bound", type=float)
+        duration_target = request.args.get("duration_target", type=float)
+        sector_limit = request.args.get("sector_limit", type=float)
+        if metric not in ("oas", "ytm") or None in (
+            sec_bound,
+            duration_target,
+            sector_limit,
+        ):
+            abort(400, "metric, sec_bound, duration_target and sector_limit required")
+        index, rows = _selection()
+        df = index.frame.iloc[rows]
+        opt_results = do_optimization(
+            df[df["class_2"] == "INDUSTRIAL"],
+            df[df["class_2"] == "FINANCIAL"],
+            df[df["class_2"] == "UTILITY"],
+            sec_bound,
+            duration_target,
+            # Sector limit is given as a percentage, as in the UI
+            sector_limit / 100,
+            metric,
+        )
+        if opt_results is None:
+            abort(422, "Infeasible")
+        _, cusip_wts, _, _ = opt_results
+        wts = pd.DataFrame(cusip_wts, columns=["cusip", "wt"])
+        portfolio = (
+            df.merge(wts.query("wt > 0"), on="cusip")[PORTFOLIO_COLUMNS]
+            .sort_values(["wt", "ticker", "mat_dt"], ascending=[False, True, False])
+            .reset_index(drop=True)
+        )
+        return _stream(portfolio, "portfolio")
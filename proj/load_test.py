@@ -0,0 +1,343 @@
+"""This module is a load generator for a locally running instance of the app. Virtual
+analysts replay the traffic the browser sends to /_dash-update-component: pick a date
+and class type, refine the filters a few times and run an optimization. Latency and
+errors are recorded per callback and reported as throughput and p50/p95/p99, ex
+
+    python load_test.py --url http://127.0.0.1:8050 --users 8 --sessions 200
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Final, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+CALLBACK_URL: Final = "/_dash-update-component"
+LAYOUT_URL: Final = "/_dash-layout"
+CLASS_TYPES: Final = ("class_1", "class_2", "class_3", "class_4")
+# Outputs identify the callback on the server, so they must match callbacks.py
+CALLBACK_OUTPUTS: Final = {
+    "update_class_for_choices": [
+        ("class_label", "children"),
+        ("class_filter", "options"),
+        ("class_filter", "disabled"),
+        ("class_filter", "value"),
+    ],
+    "update_summary_table": [
+        ("summary_table", "data"),
+        ("summary_table", "columns"),
+        ("mv_num_bonds", "data"),
+        ("mv_num_bonds", "columns"),
+    ],
+    "populate_optimization_results": [
+        ("opt_summary", "data"),
+        ("industrial_results", "data"),
+        ("financials_results", "data"),
+        ("utility_results", "data"),
+        ("industrial_results", "columns"),
+        ("financials_results", "columns"),
+        ("utility_results", "columns"),
+        ("opt_summary", "columns"),
+        ("opt_sensitivity", "data"),
+        ("opt_sensitivity", "columns"),
+        ("opt_characteristics", "data"),
+        ("opt_contributions", "data"),
+        ("opt_top_holdings", "data"),
+    ],
+}
+PERCENTILES: Final = (50, 95, 99)
+
+
+class Sample(NamedTuple):
+    callback: str
+    latency: float
+    ok: bool
+
+
+def callback_payload(
+    outputs: Sequence[Tuple[str, str]],
+    inputs: Sequence[Tuple[str, str, object]],
+    state: Sequence[Tuple[str, str, object]] = (),
+) -> dict:
+    """Request body dash-renderer posts when the first input changes
+
+    Args:
+        outputs (Sequence[Tuple[str, str]]): (id, property) of every output
+        inputs (Sequence[Tuple[str, str, object]]): (id, property, value) of every
+        input
+        state (Sequence[Tuple[str, str, object]], optional): (id, property, value) of
+        every state. Defaults to ().
+
+    Returns:
+        dict: JSON body
+    """
+    return {
+        "output": "..{}..".format("...".join(f"{i}.{p}" for i, p in outputs)),
+        "outputs": [{"id": i, "property": p} for i, p in outputs],
+        "inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+        "state": [{"id": i, "property": p, "value": v} for i, p, v in state],
+        "changedPropIds": [f"{inputs[0][0]}.{inputs[0][1]}"],
+    }
+
+
+def layout_choices(http: requests.Session, url: str) -> Dict[str, list]:
+    """Dropdown options served in the layout, so sessions only pick real values
+
+    Args:
+        http (requests.Session): http session
+        url (str): base url of the app
+
+    Returns:
+        Dict[str, list]: component id to its option values
+    """
+    response = http.get(url + LAYOUT_URL)
+    response.raise_for_status()
+    choices = {}
+    stack = [response.json()]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack += node
+        elif isinstance(node, dict):
+            props = node.get("props", {})
+            if "id" in props and "options" in props:
+                choices[props["id"]] = [x["value"] for x in props["options"]]
+            stack += [props.get("children")]
+    return choices
+
+
+def _subset(rng: np.random.Generator, values: list) -> Optional[list]:
+    """Empty selection about a third of the time, otherwise one to three values"""
+    if not values or rng.random() < 1 / 3:
+        return None
+    size = rng.integers(1, min(3, len(values)) + 1)
+    return [values[i] for i in rng.choice(len(values), size, replace=False)]
+
+
+class VirtualAnalyst:
+    """One user clicking through the app; every callback is timed into samples"""
+
+    def __init__(
+        self,
+        url: str,
+        choices: Dict[str, list],
+        samples: List[Sample],
+        lock: threading.Lock,
+        seed: int,
+        think_time: float,
+        timeout: float,
+    ) -> None:
+        self.url = url
+        self.choices = choices
+        self.samples = samples
+        self.lock = lock
+        self.rng = np.random.default_rng(seed)
+        self.think_time = think_time
+        self.timeout = timeout
+        self.http = requests.Session()
+        # A browser tab; the app drops requests superseded within a session
+        self.session_id = uuid.uuid4().hex
+
+    def call(
+        self,
+        callback: str,
+        inputs: Sequence[Tuple[str, str, object]],
+        state: Sequence[Tuple[str, str, object]] = (),
+    ) -> Optional[dict]:
+        """Posts one callback and records its latency
+
+        Args:
+            callback (str): callback name, a key of CALLBACK_OUTPUTS
+            inputs (Sequence[Tuple[str, str, object]]): see callback_payload
+            state (Sequence[Tuple[str, str, object]], optional): see
+            callback_payload. Defaults to ().
+
+        Returns:
+            Optional[dict]: response outputs, None on error or no update
+        """
+        body = callback_payload(CALLBACK_OUTPUTS[callback], inputs, state)
+        start = time.perf_counter()
+        try:
+            response = self.http.post(
+                self.url + CALLBACK_URL, json=body, timeout=self.timeout
+            )
+            # 204 is dash's PreventUpdate
+            ok = response.status_code in (200, 204)
+        except requests.RequestException:
+            response, ok = None, False
+        with self.lock:
+            self.samples.append(Sample(callback, time.perf_counter() - start, ok))
+        if self.think_time:
+            time.sleep(self.rng.exponential(self.think_time))
+        if ok and response.status_code == 200:
+            return response.json().get("response")
+        return None
+
+    def run_session(self) -> None:
+        """Date and class type, two to four filter refinements, then an optimization"""
+        rng = self.rng
+        date_value = rng.choice(self.choices["date_filter"])
+        class_type = rng.choice(CLASS_TYPES)
+        result = self.call(
+            "update_class_for_choices",
+            [("date_filter", "value", date_value), ("class_type", "value", class_type)],
+        )
+        class_options = []
+        if result is not None:
+            class_options = [x["value"] for x in result["class_filter"]["options"]]
+        filters = [
+            ("date_filter", "value", date_value),
+            ("class_filter", "value", None),
+            ("rating_filter", "value", None),
+            ("dur_cell_filter", "value", None),
+        ]
+        for _ in range(rng.integers(2, 5)):
+            filters[1:] = [
+                ("class_filter", "value", _subset(rng, class_options)),
+                ("rating_filter", "value", _subset(rng, self.choices["rating_filter"])),
+                (
+                    "dur_cell_filter",
+                    "value",
+                    _subset(rng, self.choices["dur_cell_filter"]),
+                ),
+            ]
+            self.call(
+                "update_summary_table",
+                filters,
+                [
+                    ("class_type", "value", class_type),
+                    ("session_id", "data", self.session_id),
+                ],
+            )
+        self.call(
+            "populate_optimization_results",
+            [("opt_button", "n_clicks", 1)],
+            [
+                filters[0],
+                ("class_type", "value", class_type),
+                *filters[1:],
+                ("opt_metric", "value", rng.choice(["oas", "ytm"])),
+                ("sec_bound", "value", float(rng.choice([0.01, 0.02, 0.03]))),
+                ("duration_target", "value", round(float(rng.uniform(3, 7)), 1)),
+                ("sector_limit", "value", int(rng.integers(20, 51))),
+                ("risk_mode", "value", "none"),
+                ("risk_cap", "value", None),
+            ],
+        )
+
+
+def summarize(samples: Sequence[Sample], elapsed: float) -> Dict[str, dict]:
+    """Throughput, error rate and latency percentiles per callback and overall
+
+    Args:
+        samples (Sequence[Sample]): recorded calls
+        elapsed (float): wall time of the run, seconds
+
+    Returns:
+        Dict[str, dict]: callback name (or total) to its statistics, latency in ms
+    """
+    groups = {
+        name: [x for x in samples if x.callback == name] for name in CALLBACK_OUTPUTS
+    }
+    groups["total"] = list(samples)
+    report = {}
+    for name, group in groups.items():
+        latencies = np.array([x.latency for x in group]) * 1000
+        errors = sum(not x.ok for x in group)
+        report[name] = {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": errors / len(group) if group else 0.0,
+            "throughput": len(group) / elapsed if elapsed > 0 else 0.0,
+            **{
+                f"p{p}": float(np.percentile(latencies, p)) if group else None
+                for p in PERCENTILES
+            },
+        }
+    return report
+
+
+def format_report(report: Dict[str, dict]) -> str:
+    """Fixed width table of summarize's output
+
+    Args:
+        report (Dict[str, dict]): output of summarize
+
+    Returns:
+        str: table
+    """
+    header = ["callback", "requests", "errors", "err %", "req/s"] + [
+        f"p{p} ms" for p in PERCENTILES
+    ]
+    lines = ["{:<32}{:>10}{:>8}{:>8}{:>9}{:>10}{:>10}{:>10}".format(*header)]
+    for name, stats in report.items():
+        latencies = [
+            "--" if stats[f"p{p}"] is None else f"{stats[f'p{p}']:.1f}"
+            for p in PERCENTILES
+        ]
+        lines.append(
+            "{:<32}{:>10}{:>8}{:>8.2f}{:>9.2f}{:>10}{:>10}{:>10}".format(
+                name,
+                stats["requests"],
+                stats["errors"],
+                stats["error_rate"] * 100,
+                stats["throughput"],
+                *latencies,
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Dict[str, dict]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--users", type=int, default=4, help="concurrent analysts")
+    parser.add_argument("--sessions", type=int, default=50, help="sessions in total")
+    parser.add_argument(
+        "--duration", type=float, help="stop starting sessions after this many seconds"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="mean pause between calls, s"
+    )
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    url = args.url.rstrip("/")
+    choices = layout_choices(requests.Session(), url)
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    analysts = [
+        VirtualAnalyst(
+            url, choices, samples, lock, args.seed + i, args.think_time, args.timeout
+        )
+        for i in range(args.users)
+    ]
+    remaining = iter(range(args.sessions))
+    start = time.perf_counter()
+
+    def work(analyst: VirtualAnalyst) -> None:
+        while args.duration is None or time.perf_counter() - start < args.duration:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            analyst.run_session()
+
+    with ThreadPoolExecutor(args.users) as pool:
+        list(pool.map(work, analysts))
+    report = summarize(samples, time.perf_counter() - start)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
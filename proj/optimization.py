@@ -1,13 +1,236 @@
 """This module will hold the optimization computation."""
+import re
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
-from typing import List, Tuple
+from typing import Dict, Final, Iterable, List, NamedTuple, Optional, Tuple, Union
 
+import cvxpy as cp
+import numpy as np
 import pandas as pd
 import pulp
 from pulp.pulp import lpSum
 
+# Limits for the closed-form solver's search over the duration multiplier; these are
+# generous enough that hitting either means the inputs are badly scaled and the LP
+# should take over
+MAX_BRACKET_EXPANSIONS: Final = 128
+MAX_BISECTIONS: Final = 200
+DURATION_TOL: Final = 1e-9
+# Relative objective gain below which a multiplier is taken as optimal; rounding level
+# since the dual slopes can be tiny when the bracketing durations are near the target
+MULTIPLIER_TOL: Final = 1e-13
+SENSITIVITY_TOL: Final = 1e-9
+WEIGHT_TOL: Final = 1e-12
+# Interior point weights of bonds that aren't held are small but not zero
+SOCP_WEIGHT_TOL: Final = 1e-7
 
-def do_optimization(
+SECTORS: Final = ("INDUSTRIAL", "FINANCIAL", "UTILITY")
+# Constraint rows in the order they are added to the model
+CONSTRAINT_NAMES: Final = (
+    "Total weight bound",
+    "Portfolio duration bound",
+    "Industrial sector bound",
+    "Financial sector bound",
+    "Utility sector bound",
+)
+DURATION_ROW: Final = 1
+# Spread scenarios shock buckets of these columns; ALL shifts every bond
+SHOCK_DIMENSIONS: Final = ("class_2", "rating")
+PARALLEL_SHOCK: Final = "ALL"
+BASE_SCENARIO: Final = "Base"
+SCENARIO_COLUMNS: Final = [
+    "scenario",
+    "status",
+    "objective",
+    "objective_change",
+    "oas",
+    "ytm",
+    "effdur",
+    "cash_wt",
+    "holdings",
+    *[f"{x.lower()}_wt" for x in SECTORS],
+    "turnover",
+]
+SHOCK_PATTERN: Final = re.compile(r"^\s*([^=]+?)\s*=\s*([+-]?\d+(?:\.\d*)?)\s*$")
+
+
+class FastPathError(Exception):
+    """Raised when the closed-form solver cannot certify a solution"""
+
+
+def _greedy_weights(
+    scores: np.ndarray,
+    sector_ids: np.ndarray,
+    security_bound: float,
+    sector_bound: float,
+) -> np.ndarray:
+    """Maximizes scores @ x subject to the box, budget and sector constraints. Those
+    capacities form a laminar family (bond within sector within portfolio) so filling
+    bonds in descending score order is optimal
+
+    Args:
+        scores (np.ndarray): per-bond score to maximize
+        sector_ids (np.ndarray): integer sector label of every bond
+        security_bound (float): single security weight bound
+        sector_bound (float): per-sector weight bound
+
+    Returns:
+        np.ndarray: weights in the same order as scores
+    """
+    wts = np.zeros(len(scores))
+    positive = np.flatnonzero(scores > 0)
+    if positive.size == 0:
+        return wts
+    order = positive[np.argsort(-scores[positive], kind="stable")]
+    sectors = sector_ids[order]
+    # Position of each bond within its own sector, following the global order
+    rank = np.empty(order.size)
+    for sector in np.unique(sectors):
+        in_sector = sectors == sector
+        rank[in_sector] = np.arange(in_sector.sum())
+    alloc = np.clip(sector_bound - security_bound * rank, 0, security_bound)
+    # Drop rounding dust left when the sector bound is a multiple of the security bound
+    alloc[alloc < WEIGHT_TOL] = 0
+    used = np.cumsum(alloc) - alloc
+    wts[order] = np.clip(1 - used, 0, alloc)
+    return wts
+
+
+def fast_optimization(
+    costs: np.ndarray,
+    durations: np.ndarray,
+    sector_ids: np.ndarray,
+    security_bound: float,
+    duration_target: float,
+    sector_bound: float,
+) -> Optional[Tuple[float, np.ndarray, float]]:
+    """Solves the standard problem exactly without an LP solver. The duration equality
+    is dualized with multiplier lam, the remaining problem is solved greedily and lam
+    is narrowed until the greedy portfolios bracket the target; mixing the two
+    bracketing portfolios hits the target and is optimal by weak duality
+
+    Args:
+        costs (np.ndarray): metric to maximize per bond
+        durations (np.ndarray): effective duration per bond
+        sector_ids (np.ndarray): integer sector label of every bond
+        security_bound (float): single security weight bound
+        duration_target (float): portfolio duration target
+        sector_bound (float): per-sector weight bound
+
+    Raises:
+        FastPathError: the multiplier could not be bracketed or did not converge
+
+    Returns:
+        Optional[Tuple[float, np.ndarray, float]]: objective, weights and the optimal
+        duration multiplier, None if infeasible
+    """
+
+    def solve(lam: float) -> Tuple[np.ndarray, float]:
+        wts = _greedy_weights(
+            costs - lam * durations, sector_ids, security_bound, sector_bound
+        )
+        return wts, durations @ wts
+
+    tol = DURATION_TOL * max(1.0, abs(duration_target))
+    max_dur = durations @ _greedy_weights(
+        durations, sector_ids, security_bound, sector_bound
+    )
+    min_dur = -(
+        (-durations)
+        @ _greedy_weights(-durations, sector_ids, security_bound, sector_bound)
+    )
+    if not min_dur - tol <= duration_target <= max_dur + tol:
+        return None
+
+    # Duration is non-increasing in lam; find lo/hi on either side of the target
+    scale = max(np.abs(costs).max(initial=1.0), 1.0) / max(
+        np.abs(durations).max(initial=1.0), 1e-12
+    )
+    lo, hi = -scale, scale
+    for _ in range(MAX_BRACKET_EXPANSIONS):
+        wts_lo, dur_lo = solve(lo)
+        if dur_lo >= duration_target - tol:
+            break
+        lo *= 2
+    else:
+        raise FastPathError("Could not bracket the duration multiplier from below")
+    for _ in range(MAX_BRACKET_EXPANSIONS):
+        wts_hi, dur_hi = solve(hi)
+        if dur_hi <= duration_target + tol:
+            break
+        hi *= 2
+    else:
+        raise FastPathError("Could not bracket the duration multiplier from above")
+
+    for _ in range(MAX_BISECTIONS):
+        if min(dur_lo - duration_target, duration_target - dur_hi) <= tol:
+            break
+        if hi - lo <= 1e-15 * max(1.0, abs(lo), abs(hi)):
+            break
+        # The Lagrangian lines of the bracketing portfolios cross where both can be
+        # optimal; if nothing beats either of them there, the crossing is the optimal
+        # multiplier. Convexity puts the crossing inside the bracket up to rounding
+        mid = min(max(costs @ (wts_lo - wts_hi) / (dur_lo - dur_hi), lo), hi)
+        wts_mid, dur_mid = solve(mid)
+        scores = costs - mid * durations
+        gain = max(scores @ (wts_mid - wts_lo), scores @ (wts_mid - wts_hi))
+        if gain <= MULTIPLIER_TOL * max(1.0, np.abs(scores) @ wts_mid):
+            lo = hi = mid
+            break
+        if mid in (lo, hi):
+            # Rounding left the crossing on the bracket, which would not shrink it
+            mid = (lo + hi) / 2
+            wts_mid, dur_mid = solve(mid)
+        if dur_mid >= duration_target:
+            lo, wts_lo, dur_lo = mid, wts_mid, dur_mid
+        else:
+            hi, wts_hi, dur_hi = mid, wts_mid, dur_mid
+    else:
+        # Mixing an uncertified bracket could be suboptimal; leave it to CBC
+        raise FastPathError("Duration multiplier did not converge")
+
+    if dur_lo - duration_target <= tol:
+        return float(costs @ wts_lo), wts_lo, lo
+    if duration_target - dur_hi <= tol:
+        return float(costs @ wts_hi), wts_hi, hi
+    theta = min(max((duration_target - dur_hi) / (dur_lo - dur_hi), 0.0), 1.0)
+    wts = theta * wts_lo + (1 - theta) * wts_hi
+    return float(costs @ wts), wts, (lo + hi) / 2
+
+
+def _is_standard_problem(
+    sector_dfs: List[pd.DataFrame],
+    security_bound: float,
+    sector_bound: float,
+    metric_col: str,
+) -> bool:
+    """Checks that the inputs describe only the box/budget/duration/sector model the
+    closed-form solver handles
+
+    Args:
+        sector_dfs (List[pd.DataFrame]): industrial, financial and utility bonds
+        security_bound (float): single security weight bound
+        sector_bound (float): per-sector weight bound
+        metric_col (str): column to maximize
+
+    Returns:
+        bool: True if fast_optimization can be used
+    """
+    if security_bound is None or sector_bound is None:
+        return False
+    if security_bound < 0 or sector_bound < 0:
+        return False
+    cusips = pd.concat([df["cusip"] for df in sector_dfs])
+    if not cusips.is_unique:
+        return False
+    for df in sector_dfs:
+        values = df[[metric_col, "effdur"]].to_numpy(dtype=float)
+        if not np.isfinite(values).all():
+            return False
+    return True
+
+
+def _lp_optimization(
     industrial_df: pd.DataFrame,
     financial_df: pd.DataFrame,
     utility_df: pd.DataFrame,
@@ -15,7 +238,7 @@ def do_optimization(
     duration_target: float,
     sector_bound: float,
     metric_col: str,
-) -> Tuple[float, List[Tuple[str, float]]]:
+) -> Optional[Tuple[float, np.ndarray, np.ndarray, np.ndarray, None]]:
     my_problem = pulp.LpProblem(sense=pulp.LpMaximize)
     industrial_vars, financial_vars, utility_vars = [
         [pulp.LpVariable(x, lowBound=0, upBound=security_bound) for x in df["cusip"]]
@@ -50,6 +273,608 @@ def do_optimization(
     my_problem += (lpSum(utility_vars) <= sector_bound, "Utility sector bound")
     status = my_problem.solve()
     if status == 1:
-        return my_problem.objective.value(), [
-            (var.name, var.value()) for var in my_problem.variables()
+        all_vars = industrial_vars + financial_vars + utility_vars
+        return (
+            my_problem.objective.value(),
+            np.array([var.value() for var in all_vars], dtype=float),
+            np.array([con.pi for con in my_problem.constraints.values()], dtype=float),
+            np.array([var.dj for var in all_vars], dtype=float),
+            None,
+        )
+
+
+def _risk_optimization(
+    costs: np.ndarray,
+    durations: np.ndarray,
+    sector_ids: np.ndarray,
+    security_bound: float,
+    duration_target: float,
+    sector_bound: float,
+    risk_model,
+    risk_cap: float,
+    tracking_error: bool,
+) -> Optional[Tuple[float, np.ndarray, np.ndarray, np.ndarray, float]]:
+    """Standard model plus a volatility or tracking error cap, solved as an SOCP. The
+    factor part of the risk is carried by k exposure variables so the cone has n + k
+    entries and nothing of size n^2 is formed
+
+    Args:
+        costs (np.ndarray): metric to maximize per bond
+        durations (np.ndarray): effective duration per bond
+        sector_ids (np.ndarray): integer sector label of every bond
+        security_bound (float): single security weight bound
+        duration_target (float): portfolio duration target
+        sector_bound (float): per-sector weight bound
+        risk_model (FactorRiskModel): risk model over the same bonds
+        risk_cap (float): volatility cap, bp
+        tracking_error (bool): cap risk relative to the risk model's benchmark
+
+    Returns:
+        Optional[Tuple[float, np.ndarray, np.ndarray, np.ndarray, float]]: objective,
+        weights, constraint duals, reduced costs and the cap's dual, None if infeasible
+    """
+    benchmark = risk_model.benchmark if tracking_error else np.zeros(len(costs))
+    factor_root = np.linalg.cholesky(risk_model.factor_cov)
+    wts = cp.Variable(len(costs))
+    factor_risk = cp.Variable(factor_root.shape[1])
+    active = wts - benchmark
+    rows = [
+        cp.sum(wts) <= 1,
+        durations @ wts == duration_target,
+        *[cp.sum(wts[sector_ids == i]) <= sector_bound for i in range(len(SECTORS))],
+    ]
+    # With no security bound the budget caps every weight at 1 anyway
+    cap = 1.0 if security_bound is None else security_bound
+    lower, upper = wts >= 0, wts <= cap
+    risk = cp.SOC(
+        cp.Constant(risk_cap),
+        cp.hstack(
+            [
+                factor_risk,
+                cp.multiply(np.sqrt(risk_model.specific_var), active),
+            ]
+        ),
+    )
+    problem = cp.Problem(
+        cp.Maximize(costs @ wts),
+        rows
+        + [
+            lower,
+            upper,
+            factor_risk == factor_root.T @ (risk_model.exposures.T @ active),
+            risk,
+        ],
+    )
+    try:
+        problem.solve(solver=cp.ECOS)
+    except cp.SolverError:
+        return None
+    if problem.status != cp.OPTIMAL:
+        return None
+    duals = np.array([float(np.squeeze(row.dual_value)) for row in rows])
+    held = np.where(wts.value < SOCP_WEIGHT_TOL, 0, wts.value)
+    return (
+        float(problem.value),
+        np.minimum(held, cap),
+        duals,
+        upper.dual_value - lower.dual_value,
+        float(np.squeeze(risk.dual_value[0])),
+    )
+
+
+def _constraint_matrix(durations: np.ndarray, sector_ids: np.ndarray) -> np.ndarray:
+    """Rows of the model in CONSTRAINT_NAMES order; bonds are the columns
+
+    Args:
+        durations (np.ndarray): effective duration per bond
+        sector_ids (np.ndarray): integer sector label of every bond
+
+    Returns:
+        np.ndarray: constraint coefficients, one row per constraint
+    """
+    return np.vstack(
+        [
+            np.ones(len(durations)),
+            durations,
+            *[sector_ids == i for i in range(len(SECTORS))],
         ]
+    ).astype(float)
+
+
+def _laminar_duals(
+    scores: np.ndarray,
+    wts: np.ndarray,
+    sector_ids: np.ndarray,
+    security_bound: float,
+    sector_bound: float,
+) -> Tuple[float, np.ndarray]:
+    """Budget and sector duals of the greedy subproblem with scores already net of the
+    duration multiplier; a tight capacity is worth the best score still waiting on it
+
+    Args:
+        scores (np.ndarray): metric less multiplier times duration, per bond
+        wts (np.ndarray): optimal weights
+        sector_ids (np.ndarray): integer sector label of every bond
+        security_bound (float): single security weight bound
+        sector_bound (float): per-sector weight bound
+
+    Returns:
+        Tuple[float, np.ndarray]: budget dual and the dual of every sector
+    """
+    unfilled = wts < security_bound - SENSITIVITY_TOL
+    sector_slack = (
+        np.bincount(sector_ids, weights=wts, minlength=len(SECTORS))
+        < sector_bound - SENSITIVITY_TOL
+    )
+    budget_dual = 0.0
+    if wts.sum() >= 1 - SENSITIVITY_TOL:
+        budget_dual = max(
+            scores[unfilled & sector_slack[sector_ids]].max(initial=0.0), 0.0
+        )
+    sector_duals = np.zeros(len(SECTORS))
+    for i in np.flatnonzero(~sector_slack):
+        waiting = scores[unfilled & (sector_ids == i)].max(initial=0.0)
+        sector_duals[i] = max(waiting - budget_dual, 0.0)
+    return budget_dual, sector_duals
+
+
+def _rhs_ranges(
+    constraints: np.ndarray,
+    rhs: np.ndarray,
+    wts: np.ndarray,
+    security_bound: float,
+    duals: np.ndarray,
+    reduced_costs: np.ndarray,
+) -> List[Tuple[Optional[float], Optional[float]]]:
+    """Right hand side ranging: rebuilds the optimal basis from the solution and finds
+    how far each right hand side can move before a basic variable hits a bound, which is
+    the interval over which that constraint's dual is unchanged
+
+    Args:
+        constraints (np.ndarray): constraint matrix, see _constraint_matrix
+        rhs (np.ndarray): right hand sides
+        wts (np.ndarray): optimal weights
+        security_bound (float): single security weight bound
+        duals (np.ndarray): constraint duals
+        reduced_costs (np.ndarray): reduced cost per bond
+
+    Returns:
+        List[Tuple[Optional[float], Optional[float]]]: lower and upper end of the range
+        for every constraint, None where unbounded or the basis can't be rebuilt
+    """
+    num_rows = len(rhs)
+    slacks = rhs - constraints @ wts
+    unit = np.eye(num_rows)
+    basis, values, uppers = [], [], []
+    free = np.flatnonzero(
+        (wts > SENSITIVITY_TOL) & (wts < security_bound - SENSITIVITY_TOL)
+    )
+    for i in free:
+        basis.append(constraints[:, i])
+        values.append(wts[i])
+        uppers.append(security_bound)
+    # The duration row is an equality and has no slack column
+    for k in range(num_rows):
+        if k != DURATION_ROW and slacks[k] > SENSITIVITY_TOL:
+            basis.append(unit[:, k])
+            values.append(slacks[k])
+            uppers.append(np.inf)
+    if len(basis) > num_rows:
+        return [(None, None)] * num_rows
+    # Degenerate vertex: complete the basis with columns priced at zero
+    candidates = [
+        (abs(reduced_costs[i]), constraints[:, i], wts[i], security_bound)
+        for i in np.flatnonzero(np.abs(reduced_costs) <= SENSITIVITY_TOL)
+        if i not in free
+    ] + [
+        (abs(duals[k]), unit[:, k], 0.0, np.inf)
+        for k in range(num_rows)
+        if k != DURATION_ROW
+        and slacks[k] <= SENSITIVITY_TOL
+        and abs(duals[k]) <= SENSITIVITY_TOL
+    ]
+    for _, column, value, upper in sorted(candidates, key=lambda x: x[0]):
+        if len(basis) == num_rows:
+            break
+        if np.linalg.matrix_rank(np.column_stack(basis + [column])) > len(basis):
+            basis.append(column)
+            values.append(value)
+            uppers.append(upper)
+    basis_matrix = np.column_stack(basis) if basis else np.zeros((num_rows, 0))
+    if len(basis) < num_rows or np.linalg.matrix_rank(basis_matrix) < num_rows:
+        return [(None, None)] * num_rows
+
+    values, uppers = np.array(values), np.array(uppers)
+    # Column k is the change in the basic variables per unit increase in rhs k
+    steps = np.linalg.solve(basis_matrix, unit)
+    ranges = []
+    for k in range(num_rows):
+        step = steps[:, k]
+        rising, falling = step > SENSITIVITY_TOL, step < -SENSITIVITY_TOL
+        with np.errstate(divide="ignore", invalid="ignore"):
+            up = np.concatenate(
+                [
+                    (uppers[rising] - values[rising]) / step[rising],
+                    -values[falling] / step[falling],
+                ]
+            )
+            down = np.concatenate(
+                [
+                    -values[rising] / step[rising],
+                    (uppers[falling] - values[falling]) / step[falling],
+                ]
+            )
+        t_max, t_min = up.min(initial=np.inf), down.max(initial=-np.inf)
+        ranges.append(
+            (
+                float(rhs[k] + t_min) if np.isfinite(t_min) else None,
+                float(rhs[k] + t_max) if np.isfinite(t_max) else None,
+            )
+        )
+    return ranges
+
+
+def _sensitivity_rows(
+    constraints: np.ndarray,
+    rhs: np.ndarray,
+    wts: np.ndarray,
+    security_bound: float,
+    duals: np.ndarray,
+    reduced_costs: np.ndarray,
+    risk: Optional[Tuple[float, float, float]] = None,
+) -> List[Dict[str, Union[str, float, None]]]:
+    """Shadow price, slack and right hand side range of every constraint, shaped as
+    table rows; the security bound row is the value of raising every bond's bound
+
+    Args:
+        constraints (np.ndarray): constraint matrix, see _constraint_matrix
+        rhs (np.ndarray): right hand sides
+        wts (np.ndarray): optimal weights
+        security_bound (float): single security weight bound, None if unbounded
+        duals (np.ndarray): constraint duals
+        reduced_costs (np.ndarray): reduced cost per bond
+        risk (Optional[Tuple[float, float, float]], optional): risk cap, achieved
+        risk and the cap's dual when risk constrained. Defaults to None.
+
+    Returns:
+        List[Dict[str, Union[str, float, None]]]: one row per constraint
+    """
+    # Without a security bound no bond is ever at it
+    bound = np.inf if security_bound is None else security_bound
+    # Ranging relies on an LP basis, which the SOCP solve does not have
+    if risk is not None or not (
+        np.isfinite(duals).all() and np.isfinite(reduced_costs).all()
+    ):
+        ranges = [(None, None)] * len(rhs)
+    else:
+        ranges = _rhs_ranges(constraints, rhs, wts, bound, duals, reduced_costs)
+    slacks = rhs - constraints @ wts
+    rows = [
+        {
+            "constraint": name,
+            "rhs": float(rhs[k]),
+            "slack": float(slacks[k]),
+            "shadow_price": float(duals[k]),
+            "rhs_lower": ranges[k][0],
+            "rhs_upper": ranges[k][1],
+        }
+        for k, name in enumerate(CONSTRAINT_NAMES)
+    ]
+    at_bound = wts >= bound - SENSITIVITY_TOL
+    rows.append(
+        {
+            "constraint": "Security weight bound",
+            "rhs": security_bound,
+            "slack": None,
+            "shadow_price": float(np.clip(reduced_costs[at_bound], 0, None).sum()),
+            "rhs_lower": None,
+            "rhs_upper": None,
+        }
+    )
+    if risk is not None:
+        risk_cap, achieved, risk_dual = risk
+        rows.append(
+            {
+                "constraint": "Risk cap (bp)",
+                "rhs": risk_cap,
+                "slack": risk_cap - achieved,
+                "shadow_price": risk_dual,
+                "rhs_lower": None,
+                "rhs_upper": None,
+            }
+        )
+    return rows
+
+
+def do_optimization(
+    industrial_df: pd.DataFrame,
+    financial_df: pd.DataFrame,
+    utility_df: pd.DataFrame,
+    security_bound: float,
+    duration_target: float,
+    sector_bound: float,
+    metric_col: str,
+    use_fast_path: bool = True,
+    risk_model=None,
+    risk_cap: Optional[float] = None,
+    tracking_error: bool = False,
+) -> Optional[
+    Tuple[
+        float,
+        List[Tuple[str, float]],
+        List[Dict[str, Union[str, float, None]]],
+        List[Tuple[str, float]],
+    ]
+]:
+    """Maximizes the weighted metric subject to security, budget, duration and sector
+    constraints. The closed-form solver is tried first and CBC is used whenever it does
+    not apply. Every solve also reports the sensitivity of the optimum. Given a risk
+    model and cap, portfolio volatility (or tracking error against the risk model's
+    benchmark) is also capped and the problem is solved as an SOCP instead
+
+    Args:
+        industrial_df (pd.DataFrame): industrial bonds
+        financial_df (pd.DataFrame): financial bonds
+        utility_df (pd.DataFrame): utility bonds
+        security_bound (float): single security weight bound
+        duration_target (float): portfolio duration target
+        sector_bound (float): per-sector weight bound
+        metric_col (str): column to maximize, ex oas
+        use_fast_path (bool, optional): try the closed-form solver. Defaults to True.
+        risk_model (FactorRiskModel, optional): risk model over the concatenated
+        industrial, financial and utility bonds. Defaults to None.
+        risk_cap (Optional[float], optional): volatility cap, bp. Defaults to None.
+        tracking_error (bool, optional): cap tracking error rather than volatility.
+        Defaults to False.
+
+    Returns:
+        Optional[ Tuple[ float, List[Tuple[str, float]],
+        List[Dict[str, Union[str, float, None]]], List[Tuple[str, float]], ] ]:
+        objective, (cusip, weight) pairs, constraint shadow prices with their valid
+        right hand side ranges and (cusip, reduced cost) pairs, None if infeasible
+    """
+    sector_dfs = [industrial_df, financial_df, utility_df]
+    costs, durations = [
+        np.concatenate([df[col].to_numpy(dtype=float) for df in sector_dfs])
+        for col in [metric_col, "effdur"]
+    ]
+    sector_ids = np.repeat(np.arange(len(sector_dfs)), [len(df) for df in sector_dfs])
+    risk_constrained = risk_model is not None and risk_cap is not None
+    result = None
+    if (
+        use_fast_path
+        and not risk_constrained
+        and _is_standard_problem(sector_dfs, security_bound, sector_bound, metric_col)
+    ):
+        try:
+            fast_result = fast_optimization(
+                costs,
+                durations,
+                sector_ids,
+                security_bound,
+                duration_target,
+                sector_bound,
+            )
+        except FastPathError:
+            pass
+        else:
+            if fast_result is None:
+                return None
+            objective, wts, multiplier = fast_result
+            scores = costs - multiplier * durations
+            budget_dual, sector_duals = _laminar_duals(
+                scores, wts, sector_ids, security_bound, sector_bound
+            )
+            duals = np.array([budget_dual, multiplier, *sector_duals])
+            result = (
+                objective,
+                wts,
+                duals,
+                scores - budget_dual - sector_duals[sector_ids],
+                None,
+            )
+    if risk_constrained:
+        result = _risk_optimization(
+            costs,
+            durations,
+            sector_ids,
+            security_bound,
+            duration_target,
+            sector_bound,
+            risk_model,
+            risk_cap,
+            tracking_error,
+        )
+        if result is None:
+            return None
+    elif result is None:
+        result = _lp_optimization(
+            industrial_df,
+            financial_df,
+            utility_df,
+            security_bound,
+            duration_target,
+            sector_bound,
+            metric_col,
+        )
+        if result is None:
+            return None
+    objective, wts, duals, reduced_costs, risk_dual = result
+    risk = None
+    if risk_constrained:
+        benchmark = risk_model.benchmark if tracking_error else np.zeros(len(wts))
+        risk = risk_cap, risk_model.volatility(wts - benchmark), risk_dual
+    constraints = _constraint_matrix(durations, sector_ids)
+    rhs = np.array([1.0, duration_target, *[sector_bound] * len(SECTORS)])
+    cusips = list(chain.from_iterable(df["cusip"] for df in sector_dfs))
+    return (
+        objective,
+        list(zip(cusips, wts.tolist())),
+        _sensitivity_rows(
+            constraints, rhs, wts, security_bound, duals, reduced_costs, risk
+        ),
+        list(zip(cusips, reduced_costs.tolist())),
+    )
+
+
+class SpreadScenario(NamedTuple):
+    name: str
+    # Shock key (sector, rating or ALL) to the OAS move in bp
+    shifts: Dict[str, float]
+
+
+def parse_scenarios(text: str, known_keys: Iterable[str]) -> List[SpreadScenario]:
+    """Reads one scenario per line, ex "Financials wider: FINANCIAL=+50, BBB=+20";
+    ALL shifts every bond and moves on the same bucket add up
+
+    Args:
+        text (str): scenario definitions
+        known_keys (Iterable[str]): sectors and ratings that may be shocked
+
+    Raises:
+        ValueError: a line can't be read or shocks an unknown bucket
+
+    Returns:
+        List[SpreadScenario]: scenarios in the order given
+    """
+    known_keys = {x.upper() for x in known_keys} | {PARALLEL_SHOCK}
+    scenarios = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        name, sep, shocks = line.rpartition(":")
+        if not sep:
+            name, shocks = f"Scenario {number}", line
+        shifts: Dict[str, float] = {}
+        for shock in shocks.split(","):
+            match = SHOCK_PATTERN.match(shock)
+            if match is None:
+                raise ValueError(f"Line {number}: can't read shock '{shock.strip()}'")
+            key = match.group(1).upper()
+            if key not in known_keys:
+                raise ValueError(f"Line {number}: unknown sector or rating '{key}'")
+            shifts[key] = shifts.get(key, 0.0) + float(match.group(2))
+        scenarios.append(SpreadScenario(name.strip(), shifts))
+    return scenarios
+
+
+def shock_matrix(df: pd.DataFrame, scenarios: List[SpreadScenario]) -> np.ndarray:
+    """OAS moves of every bond under every scenario; each dimension contributes a
+    small scenario x bucket table gathered through the bonds' bucket codes
+
+    Args:
+        df (pd.DataFrame): bonds with class_2 and rating
+        scenarios (List[SpreadScenario]): scenarios to apply
+
+    Returns:
+        np.ndarray: scenario x bond shifts, bp
+    """
+    shifts = np.zeros((len(scenarios), len(df)))
+    shifts += np.array([x.shifts.get(PARALLEL_SHOCK, 0.0) for x in scenarios])[:, None]
+    for dim in SHOCK_DIMENSIONS:
+        codes, uniques = pd.factorize(df[dim].astype(str).str.upper())
+        table = np.array(
+            [[x.shifts.get(value, 0.0) for value in uniques] for x in scenarios],
+            dtype=float,
+        ).reshape(len(scenarios), len(uniques))
+        shifts += table[:, codes]
+    return shifts
+
+
+def run_scenarios(
+    df: pd.DataFrame,
+    scenarios: List[SpreadScenario],
+    security_bound: float,
+    duration_target: float,
+    sector_bound: float,
+    metric_col: str,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """Re-optimizes the universe under each scenario, plus the unshocked base. OAS is
+    floored at zero after shocking and YTM moves by the same amount as OAS
+
+    Args:
+        df (pd.DataFrame): filtered universe
+        scenarios (List[SpreadScenario]): scenarios to run
+        security_bound (float): single security weight bound
+        duration_target (float): portfolio duration target
+        sector_bound (float): per-sector weight bound
+        metric_col (str): column to maximize, oas or ytm
+        max_workers (Optional[int], optional): solver threads. Defaults to None, the
+        executor's default.
+
+    Returns:
+        pd.DataFrame: one row per scenario with SCENARIO_COLUMNS
+    """
+    scenarios = [SpreadScenario(BASE_SCENARIO, {})] + list(scenarios)
+    # Bonds in sector order, which is the order every solve works in
+    sector_dfs = [df[df["class_2"] == x] for x in SECTORS]
+    universe = pd.concat(sector_dfs)
+    sector_ids = np.repeat(np.arange(len(SECTORS)), [len(x) for x in sector_dfs])
+    durations = universe["effdur"].to_numpy(dtype=float)
+    shifts = shock_matrix(universe, scenarios)
+    oas = np.maximum(universe["oas"].to_numpy(dtype=float) + shifts, 0)
+    ytm = universe["ytm"].to_numpy(dtype=float) + shifts / 100
+    costs = oas if metric_col == "oas" else ytm
+    standard = _is_standard_problem(
+        sector_dfs, security_bound, sector_bound, metric_col
+    )
+
+    def solve(i: int) -> Optional[np.ndarray]:
+        if standard:
+            try:
+                result = fast_optimization(
+                    costs[i],
+                    durations,
+                    sector_ids,
+                    security_bound,
+                    duration_target,
+                    sector_bound,
+                )
+            except FastPathError:
+                pass
+            else:
+                return None if result is None else result[1]
+        bounds = np.cumsum([0] + [len(x) for x in sector_dfs])
+        result = do_optimization(
+            *[
+                x.assign(**{metric_col: costs[i, start:end]})
+                for x, start, end in zip(sector_dfs, bounds, bounds[1:])
+            ],
+            security_bound,
+            duration_target,
+            sector_bound,
+            metric_col,
+            use_fast_path=False,
+        )
+        return None if result is None else np.array([wt for _, wt in result[1]])
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        portfolios = list(pool.map(solve, range(len(scenarios))))
+
+    rows: List[Dict[str, Union[str, float, None]]] = []
+    for i, (scenario, wts) in enumerate(zip(scenarios, portfolios)):
+        row: Dict[str, Union[str, float, None]] = dict.fromkeys(SCENARIO_COLUMNS)
+        row["scenario"] = scenario.name
+        if wts is None:
+            row["status"] = "Infeasible"
+            rows.append(row)
+            continue
+        row.update(
+            status="Optimal",
+            objective=float(costs[i] @ wts),
+            oas=float(oas[i] @ wts),
+            ytm=float(ytm[i] @ wts),
+            effdur=float(durations @ wts),
+            cash_wt=float(1 - wts.sum()),
+            holdings=int((wts > 0).sum()),
+            **{
+                f"{x.lower()}_wt": float(wts[sector_ids == k].sum())
+                for k, x in enumerate(SECTORS)
+            },
+        )
+        if portfolios[0] is not None:
+            row["objective_change"] = row["objective"] - float(costs[0] @ portfolios[0])
+            row["turnover"] = float(np.abs(wts - portfolios[0]).sum() / 2)
+        rows.append(row)
+    return pd.DataFrame(rows, columns=SCENARIO_COLUMNS)
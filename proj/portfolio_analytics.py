@@ -0,0 +1,141 @@
+"""This module turns solver weights into the optimization result tables. Weights are
+mapped onto the universe rows once; the holdings, the sector totals behind the cash
+weight, the portfolio's weighted characteristics and the contributions by sector,
+rating and duration cell all come from that one weighted frame, with the group sums
+done by bincount over factorized codes rather than per-group joins.
+"""
+
+from typing import Dict, Final, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ANALYTICS_MEASURES: Final = ("oas", "ytm", "effdur")
+CONTRIBUTION_DIMENSIONS: Final = ("class_2", "rating", "dur_cell")
+HOLDING_COLUMNS: Final = ["cusip", "ticker", "mat_dt", "wts"]
+TOP_HOLDINGS: Final = 10
+
+
+class PortfolioAnalytics(NamedTuple):
+    # Held bonds, largest weight first, with class_2, rating, dur_cell and measures
+    holdings: pd.DataFrame
+    # Weight per class_2 value, zero for sectors without holdings
+    sector_wts: Dict[str, float]
+    cash_wt: float
+    # Weighted average of every measure over the invested weight
+    characteristics: Dict[str, float]
+    # dimension, group, wt and the contribution (wt * measure) of every measure
+    contributions: pd.DataFrame
+
+
+def portfolio_analytics(
+    df: pd.DataFrame,
+    cusip_wts: Sequence[Tuple[str, float]],
+    sectors: Sequence[str] = (),
+    measures: Sequence[str] = ANALYTICS_MEASURES,
+    dimensions: Sequence[str] = CONTRIBUTION_DIMENSIONS,
+    orders: Optional[Dict[str, Dict[str, int]]] = None,
+) -> PortfolioAnalytics:
+    """Result tables of one solve
+
+    Args:
+        df (pd.DataFrame): universe the portfolio was solved over
+        cusip_wts (Sequence[Tuple[str, float]]): solver weight of every bond
+        sectors (Sequence[str], optional): class_2 values always reported in
+        sector_wts. Defaults to ().
+        measures (Sequence[str], optional): columns to weight. Defaults to
+        ANALYTICS_MEASURES.
+        dimensions (Sequence[str], optional): columns to break contributions down
+        by. Defaults to CONTRIBUTION_DIMENSIONS.
+        orders (Optional[Dict[str, Dict[str, int]]], optional): display order of the
+        groups of a dimension, ex RATING_ORDER for rating; others sort
+        alphabetically after. Defaults to None.
+
+    Returns:
+        PortfolioAnalytics: holdings, sector weights, cash, characteristics and
+        contributions
+    """
+    cusips, wts = zip(*cusip_wts) if cusip_wts else ((), ())
+    positions = pd.Index(df["cusip"]).get_indexer(list(cusips))
+    wts = np.asarray(wts, dtype=float)
+    held = (positions >= 0) & (wts > 0)
+    positions, wts = positions[held], wts[held]
+    # Largest first; ties by ticker, then latest maturity
+    holdings = df.iloc[positions].assign(wts=wts)
+    holdings = holdings.sort_values(
+        ["wts", "ticker", "mat_dt"], ascending=[False, True, False]
+    ).reset_index(drop=True)
+    wts = holdings["wts"].to_numpy()
+    invested = wts.sum()
+    values = holdings[list(measures)].to_numpy(dtype=float)
+    weighted = values * wts[:, None]
+
+    columns = [wts, *weighted.T]
+    orders = orders or {}
+    parts = []
+    for dim in dimensions:
+        order = orders.get(dim, {})
+        # Sorted uniques make the codes, and so the sums, come out in display order
+        codes, uniques = pd.factorize(holdings[dim])
+        rank = sorted(
+            range(len(uniques)),
+            key=lambda i: (order.get(uniques[i], len(order)), str(uniques[i])),
+        )
+        position = np.empty(len(rank), dtype=np.intp)
+        position[rank] = np.arange(len(rank))
+        codes, uniques = position[codes], uniques[rank]
+        sums = np.stack(
+            [np.bincount(codes, weights=x, minlength=len(uniques)) for x in columns],
+            axis=1,
+        )
+        part = pd.DataFrame(sums, columns=["wt", *measures])
+        part.insert(0, "group", uniques)
+        part.insert(0, "dimension", dim)
+        parts.append(part)
+    contributions = (
+        pd.concat(parts, ignore_index=True)
+        if parts
+        else pd.DataFrame(columns=["dimension", "group", "wt", *measures])
+    )
+
+    sector_wts = {x: 0.0 for x in sectors}
+    sector_rows = contributions[contributions["dimension"] == "class_2"]
+    sector_wts.update(zip(sector_rows["group"], sector_rows["wt"].astype(float)))
+    characteristics = {
+        measure: float(weighted[:, i].sum() / invested) if invested > 0 else None
+        for i, measure in enumerate(measures)
+    }
+    return PortfolioAnalytics(
+        holdings,
+        sector_wts,
+        float(1 - invested),
+        characteristics,
+        contributions,
+    )
+
+
+def sector_tables(
+    analytics: PortfolioAnalytics, sectors: Sequence[str]
+) -> List[pd.DataFrame]:
+    """Holdings of each sector followed by a total row, the layout of the sector
+    result tables
+
+    Args:
+        analytics (PortfolioAnalytics): output of portfolio_analytics
+        sectors (Sequence[str]): class_2 values, one table each
+
+    Returns:
+        List[pd.DataFrame]: HOLDING_COLUMNS per sector
+    """
+    holdings = analytics.holdings
+    by_sector = dict(tuple(holdings.groupby("class_2", sort=False)))
+    empty = holdings.iloc[:0]
+    tables = []
+    for sector in sectors:
+        rows = by_sector.get(sector, empty)[HOLDING_COLUMNS]
+        total = pd.DataFrame(
+            [["--", "--", "Total", analytics.sector_wts.get(sector, 0.0)]],
+            columns=HOLDING_COLUMNS,
+        )
+        tables.append(pd.concat([rows, total], ignore_index=True))
+    return tables
@@ -0,0 +1,250 @@
+"""This module persists solved portfolios so runs can be reloaded and compared over
+time. A run is one row of parameters plus its non-zero weights, written with a single
+multi-row insert; loads go through the (run_id, cusip) primary key and diffs are an
+outer join of two weight vectors.
+"""
+
+import datetime as dt
+from typing import Dict, Final, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from flask import Flask, Response, abort, jsonify, request
+from flask_sqlalchemy import Model, SQLAlchemy
+from sqlalchemy import insert, select
+
+# Weight changes smaller than this are reported as unchanged
+DIFF_TOL: Final = 1e-9
+DIFF_COLUMNS: Final = ["cusip", "status", "wt_old", "wt_new", "change"]
+RUN_COLUMNS: Final = (
+    "run_id",
+    "created_at",
+    "eff_date",
+    "filters",
+    "metric",
+    "security_bound",
+    "duration_target",
+    "sector_bound",
+    "risk_mode",
+    "risk_cap",
+    "objective",
+)
+
+
+def diff_portfolios(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Compares two sets of holdings position by position
+
+    Args:
+        old (pd.DataFrame): earlier run's cusip and wt
+        new (pd.DataFrame): later run's cusip and wt
+
+    Returns:
+        pd.DataFrame: DIFF_COLUMNS for every bond held in either run, status being
+        added, removed, resized or unchanged; largest moves first
+    """
+    merged = old[["cusip", "wt"]].merge(
+        new[["cusip", "wt"]], on="cusip", how="outer", suffixes=("_old", "_new")
+    )
+    wt_old = merged["wt_old"].fillna(0).to_numpy(dtype=float)
+    wt_new = merged["wt_new"].fillna(0).to_numpy(dtype=float)
+    change = wt_new - wt_old
+    merged["status"] = np.select(
+        [
+            merged["wt_old"].isna().to_numpy(),
+            merged["wt_new"].isna().to_numpy(),
+            np.abs(change) > DIFF_TOL,
+        ],
+        ["added", "removed", "resized"],
+        "unchanged",
+    )
+    merged["wt_old"], merged["wt_new"], merged["change"] = wt_old, wt_new, change
+    order = np.lexsort((merged["cusip"].to_numpy(), -np.abs(change)))
+    return merged.iloc[order][DIFF_COLUMNS].reset_index(drop=True)
+
+
+class PortfolioStore:
+    """Reads and writes runs through the portfolio_run/portfolio_holding models"""
+
+    def __init__(
+        self, db: SQLAlchemy, PortfolioRun: Model, PortfolioHolding: Model
+    ) -> None:
+        self.db = db
+        self.PortfolioRun = PortfolioRun
+        self.PortfolioHolding = PortfolioHolding
+
+    def create_tables(self) -> None:
+        """Creates the run tables if they're missing, leaving main_table alone"""
+        for model in [self.PortfolioRun, self.PortfolioHolding]:
+            model.__table__.create(self.db.engine, checkfirst=True)
+
+    def save_run(
+        self,
+        eff_date: dt.date,
+        filters: Dict[str, Optional[List[str]]],
+        metric: str,
+        security_bound: float,
+        duration_target: float,
+        sector_bound: float,
+        objective: float,
+        cusip_wts: Sequence[Tuple[str, float]],
+        risk_mode: str = "none",
+        risk_cap: Optional[float] = None,
+    ) -> int:
+        """Stores a solved portfolio; zero weights are dropped
+
+        Args:
+            eff_date (dt.date): universe date
+            filters (Dict[str, Optional[List[str]]]): dimension to selected values
+            metric (str): column maximized
+            security_bound (float): single security weight bound, None if uncapped
+            duration_target (float): portfolio duration target
+            sector_bound (float): per-sector weight bound
+            objective (float): optimal objective; None, as PuLP reports an all zero
+            objective, is stored as 0
+            cusip_wts (Sequence[Tuple[str, float]]): weight of every bond
+            risk_mode (str, optional): none, volatility or tracking_error. Defaults
+            to "none".
+            risk_cap (Optional[float], optional): risk cap, bp. Defaults to None.
+
+        Returns:
+            int: id of the new run
+        """
+        session = self.db.session
+        run = self.PortfolioRun(
+            created_at=dt.datetime.utcnow(),
+            eff_date=eff_date,
+            filters=filters,
+            metric=metric,
+            security_bound=security_bound,
+            duration_target=duration_target,
+            sector_bound=sector_bound,
+            risk_mode=risk_mode,
+            risk_cap=risk_cap,
+            objective=0.0 if objective is None else objective,
+        )
+        try:
+            session.add(run)
+            session.flush()
+            holdings = [
+                {"run_id": run.run_id, "cusip": cusip, "wt": wt}
+                for cusip, wt in cusip_wts
+                if wt > 0
+            ]
+            if holdings:
+                # One executemany; psycopg2 batches it into multi-row VALUES
+                session.execute(insert(self.PortfolioHolding), holdings)
+            session.commit()
+        except Exception:
+            # Leave the scoped session usable for the rest of the request
+            session.rollback()
+            raise
+        return run.run_id
+
+    def list_runs(self, limit: int = 50) -> List[Dict[str, object]]:
+        """Most recent runs first
+
+        Args:
+            limit (int, optional): number of runs. Defaults to 50.
+
+        Returns:
+            List[Dict[str, object]]: run parameters, see RUN_COLUMNS
+        """
+        stmt = (
+            select(*[getattr(self.PortfolioRun, x) for x in RUN_COLUMNS])
+            .order_by(self.PortfolioRun.created_at.desc())
+            .limit(limit)
+        )
+        return [dict(zip(RUN_COLUMNS, x)) for x in self.db.session.execute(stmt)]
+
+    def load_run(self, run_id: int) -> Tuple[Dict[str, object], pd.DataFrame]:
+        """Parameters and holdings of one run
+
+        Args:
+            run_id (int): run to load
+
+        Raises:
+            KeyError: no such run
+
+        Returns:
+            Tuple[Dict[str, object], pd.DataFrame]: run parameters and its cusip/wt
+        """
+        stmt = select(*[getattr(self.PortfolioRun, x) for x in RUN_COLUMNS]).where(
+            self.PortfolioRun.run_id == run_id
+        )
+        run = self.db.session.execute(stmt).first()
+        if run is None:
+            raise KeyError(run_id)
+        return dict(zip(RUN_COLUMNS, run)), self._holdings(run_id)
+
+    def _holdings(self, run_id: int) -> pd.DataFrame:
+        stmt = select(self.PortfolioHolding.cusip, self.PortfolioHolding.wt).where(
+            self.PortfolioHolding.run_id == run_id
+        )
+        return pd.DataFrame(
+            list(self.db.session.execute(stmt)), columns=["cusip", "wt"]
+        ).astype({"wt": float})
+
+    def diff_runs(self, old_id: int, new_id: int) -> pd.DataFrame:
+        """Position changes from one run to another
+
+        Args:
+            old_id (int): earlier run
+            new_id (int): later run
+
+        Raises:
+            KeyError: either run doesn't exist
+
+        Returns:
+            pd.DataFrame: see diff_portfolios
+        """
+        _, old = self.load_run(old_id)
+        _, new = self.load_run(new_id)
+        return diff_portfolios(old, new)
+
+
+def diff_summary(diff: pd.DataFrame) -> Dict[str, Union[int, float]]:
+    """Counts per status and the one-way turnover between the runs
+
+    Args:
+        diff (pd.DataFrame): output of diff_portfolios
+
+    Returns:
+        Dict[str, Union[int, float]]: added, removed, resized, unchanged, turnover
+    """
+    counts = diff["status"].value_counts()
+    return {
+        **{
+            x: int(counts.get(x, 0))
+            for x in ["added", "removed", "resized", "unchanged"]
+        },
+        "turnover": float(np.abs(diff["change"].to_numpy()).sum() / 2),
+    }
+
+
+def register_portfolio_routes(server: Flask, store: PortfolioStore) -> None:
+    """Adds the /portfolios JSON routes to the flask server
+
+    Args:
+        server (Flask): flask server
+        store (PortfolioStore): saved runs
+    """
+
+    def _load(run_id: int) -> Tuple[Dict[str, object], pd.DataFrame]:
+        try:
+            return store.load_run(run_id)
+        except KeyError:
+            abort(404, f"No portfolio run {run_id}")
+
+    @server.route("/portfolios")
+    def list_portfolios() -> Response:
+        return jsonify(store.list_runs(request.args.get("limit", 50, type=int)))
+
+    @server.route("/portfolios/<int:run_id>")
+    def load_portfolio(run_id: int) -> Response:
+        run, holdings = _load(run_id)
+        return jsonify({**run, "holdings": holdings.to_dict("records")})
+
+    @server.route("/portfolios/<int:old_id>/diff/<int:new_id>")
+    def diff_portfolio(old_id: int, new_id: int) -> Response:
+        diff = diff_portfolios(_load(old_id)[1], _load(new_id)[1])
+        return jsonify({**diff_summary(diff), "positions": diff.to_dict("records")})
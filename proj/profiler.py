@@ -0,0 +1,323 @@
+"""This module captures profiles of individual requests on demand. A request is profiled
+when it carries the X-Profile header or a ?profile query flag, in which case cProfile
+runs for the whole request, or when it is still running after the latency threshold,
+in which case a sampler records its stack from then on. Either way the trace holds the
+SQL timeline of the request and goes to a directory that keeps only the newest traces;
+/profiles lists them and /profiles/<name> returns one.
+
+Requests that aren't profiled pay for a timestamp, a dict entry and, with a threshold
+set, one list append per SQL statement.
+
+Traces hold SQL text and stacks and anyone can send the header, so the header, the
+flag and the routes are ignored (the routes answer 404) unless the server runs in
+debug mode or ENABLED_CONFIG is set in its config; they are meant for local use. The
+threshold is set by the server alone and applies regardless; read the directory
+directly where the routes are off.
+"""
+
+import cProfile
+import datetime as dt
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Final, List, Optional
+
+from flask import Flask, Response, abort, current_app, g, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_HEADER: Final = "X-Profile"
+PROFILE_FLAG: Final = "profile"
+MAX_TRACES: Final = 50
+SAMPLE_INTERVAL: Final = 0.005
+TOP_FUNCTIONS: Final = 40
+TOP_STACKS: Final = 40
+MAX_STATEMENT_CHARS: Final = 500
+# Flask config key enabling on-demand profiles and /profiles outside debug mode
+ENABLED_CONFIG: Final = "PROFILE_ENABLED"
+
+
+def on_demand_enabled(server: Flask) -> bool:
+    """Whether clients may ask for profiles and read them
+
+    Args:
+        server (Flask): flask server
+
+    Returns:
+        bool: server in debug mode or ENABLED_CONFIG set
+    """
+    return bool(server.debug or server.config.get(ENABLED_CONFIG))
+
+
+class RequestTrace:
+    """What is known about one request while it runs"""
+
+    def __init__(self, thread_id: int, mode: Optional[str]) -> None:
+        self.thread_id = thread_id
+        # cprofile, sampled once past the threshold, or None while undecided
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.created = dt.datetime.utcnow()
+        self.sql: List[dict] = []
+        self.samples: Counter = Counter()
+        self.profile: Optional[cProfile.Profile] = None
+
+
+class RequestProfiler:
+    """Flask hooks, SQL listener and stack sampler behind the profiling mode
+
+    Args:
+        trace_dir (str): directory the traces are written to
+        threshold_ms (Optional[float], optional): sample any request running longer
+        than this. Defaults to None, header and flag only.
+        max_traces (int, optional): traces kept. Defaults to MAX_TRACES.
+    """
+
+    def __init__(
+        self,
+        trace_dir: str,
+        threshold_ms: Optional[float] = None,
+        max_traces: int = MAX_TRACES,
+    ) -> None:
+        self.trace_dir = trace_dir
+        self.threshold = None if threshold_ms is None else threshold_ms / 1000
+        self.max_traces = max_traces
+        self._active: Dict[int, RequestTrace] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def init_app(self, server: Flask, engine: Optional[Engine] = None) -> None:
+        """Installs the request hooks, the SQL listener and the /profiles routes; the
+        header, the flag and the routes only work in debug mode or with ENABLED_CONFIG
+        set
+
+        Args:
+            server (Flask): flask server
+            engine (Optional[Engine], optional): engine whose statements go in the
+            timeline. Defaults to None.
+        """
+        server.before_request(self._before_request)
+        server.teardown_request(self._teardown_request)
+        if engine is not None:
+            event.listen(engine, "before_cursor_execute", self._before_execute)
+            event.listen(engine, "after_cursor_execute", self._after_execute)
+
+        def check_enabled() -> None:
+            if not on_demand_enabled(server):
+                abort(404)
+
+        @server.route("/profiles")
+        def list_profiles() -> Response:
+            check_enabled()
+            return jsonify(self.list_traces())
+
+        @server.route("/profiles/<name>")
+        def get_profile(name: str) -> Response:
+            check_enabled()
+            path = os.path.join(self.trace_dir, os.path.basename(name))
+            if not name.endswith(".json") or not os.path.isfile(path):
+                abort(404)
+            with open(path) as f:
+                return Response(f.read(), mimetype="application/json")
+
+    def _before_request(self) -> None:
+        explicit = (
+            PROFILE_HEADER in request.headers or PROFILE_FLAG in request.args
+        ) and on_demand_enabled(current_app)
+        if not explicit and self.threshold is None:
+            return
+        trace = RequestTrace(threading.get_ident(), "cprofile" if explicit else None)
+        g.request_trace = trace
+        self._local.trace = trace
+        if explicit:
+            trace.profile = cProfile.Profile()
+            trace.profile.enable()
+            return
+        with self._lock:
+            self._active[trace.thread_id] = trace
+        self._ensure_sampler()
+
+    def _teardown_request(self, exc: Optional[BaseException] = None) -> None:
+        trace: Optional[RequestTrace] = g.pop("request_trace", None)
+        if trace is None:
+            return
+        self._local.trace = None
+        elapsed = time.perf_counter() - trace.start
+        if trace.profile is not None:
+            trace.profile.disable()
+        else:
+            with self._lock:
+                self._active.pop(trace.thread_id, None)
+        if trace.mode is None and elapsed >= self.threshold:
+            # Slow, but finished before the sampler got to it
+            trace.mode = "sampled"
+        if trace.mode is None:
+            return
+        try:
+            self._write(trace, elapsed, exc)
+        except OSError:
+            # Profiling must never fail the request
+            pass
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, many):
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            context._profile_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, many):
+        trace = getattr(self._local, "trace", None)
+        start = getattr(context, "_profile_start", None)
+        if trace is None or start is None:
+            return
+        trace.sql.append(
+            {
+                "start_ms": (start - trace.start) * 1000,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+                "rows": cursor.rowcount,
+                "statement": statement[:MAX_STATEMENT_CHARS],
+            }
+        )
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is None:
+            with self._lock:
+                if self._sampler is None:
+                    self._sampler = threading.Thread(target=self._sample, daemon=True)
+                    self._sampler.start()
+        self._wake.set()
+
+    def _sample(self) -> None:
+        """Records the stack of every request past the threshold; sleeps while no
+        request is running
+        """
+        while True:
+            # Under the lock so teardown never reads samples still being added
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+                else:
+                    self._sample_active()
+            if idle:
+                self._wake.wait()
+            else:
+                time.sleep(SAMPLE_INTERVAL)
+
+    def _sample_active(self) -> None:
+        now = time.perf_counter()
+        frames = sys._current_frames()
+        for trace in self._active.values():
+            if now - trace.start < self.threshold:
+                continue
+            trace.mode = "sampled"
+            frame = frames.get(trace.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                    f"{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                trace.samples[";".join(reversed(stack))] += 1
+
+    def _write(
+        self, trace: RequestTrace, elapsed: float, exc: Optional[BaseException]
+    ) -> None:
+        body = request.get_json(silent=True) or {}
+        output = body.get("output", "") if isinstance(body, dict) else ""
+        record = {
+            "created": trace.created.isoformat(),
+            "path": request.path,
+            "callback": output.strip(".").split(".")[0] or None,
+            "output": output,
+            "trigger": trace.mode,
+            "duration_ms": elapsed * 1000,
+            "error": None if exc is None else repr(exc),
+            "sql_ms": sum(x["duration_ms"] for x in trace.sql),
+            "sql": trace.sql,
+        }
+        if trace.profile is not None:
+            stats = pstats.Stats(trace.profile, stream=io.StringIO())
+            record["functions"] = [
+                {
+                    "function": f"{func[2]} ({os.path.basename(func[0])}:{func[1]})",
+                    "calls": nc,
+                    "total_ms": tt * 1000,
+                    "cumulative_ms": ct * 1000,
+                }
+                for func, (_, nc, tt, ct, _) in sorted(
+                    stats.stats.items(), key=lambda x: -x[1][3]
+                )[:TOP_FUNCTIONS]
+            ]
+        else:
+            total = sum(trace.samples.values())
+            record["sample_interval_ms"] = SAMPLE_INTERVAL * 1000
+            record["stacks"] = [
+                {"stack": stack, "samples": count, "share": count / total}
+                for stack, count in trace.samples.most_common(TOP_STACKS)
+            ]
+        os.makedirs(self.trace_dir, exist_ok=True)
+        name = "{:%Y%m%dT%H%M%S%f}-{}-{}.json".format(
+            trace.created, record["callback"] or "request", uuid.uuid4().hex[:8]
+        )
+        path = os.path.join(self.trace_dir, name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(record, f, default=str)
+        os.replace(path + ".tmp", path)
+        if trace.profile is not None:
+            trace.profile.dump_stats(path[: -len(".json")] + ".prof")
+        self._rotate()
+
+    def _rotate(self) -> None:
+        """Deletes all but the newest max_traces traces"""
+        names = sorted(x for x in os.listdir(self.trace_dir) if x.endswith(".json"))
+        for name in names[: -self.max_traces]:
+            for path in [name, name[: -len(".json")] + ".prof"]:
+                try:
+                    os.remove(os.path.join(self.trace_dir, path))
+                except FileNotFoundError:
+                    pass
+
+    def list_traces(self) -> List[dict]:
+        """Newest first
+
+        Returns:
+            List[dict]: name, created, callback, trigger and duration of every trace
+        """
+        if not os.path.isdir(self.trace_dir):
+            return []
+        traces = []
+        for name in sorted(os.listdir(self.trace_dir), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.trace_dir, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            traces.append(
+                {
+                    "name": name,
+                    **{
+                        x: record.get(x)
+                        for x in [
+                            "created",
+                            "callback",
+                            "trigger",
+                            "duration_ms",
+                            "sql_ms",
+                        ]
+                    },
+                }
+            )
+        return traces
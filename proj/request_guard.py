@@ -0,0 +1,213 @@
+"""This module drops superseded callback executions. Every browser tab carries a session
+id; each filter-driven callback takes a sequence number per (session, channel) when it
+starts, so a request that has been overtaken by a newer one from the same tab stops
+before doing any more work. Requests that reach the database register their backend
+pid, and the newer request cancels the older one's statement with pg_cancel_backend.
+Every guarded statement also runs under a statement_timeout as a backstop.
+
+Sequencing is per process, so the app should run as one process with threads (see
+the Procfile); a sync worker can't see a newer request until the old one is done.
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Final, Iterator, Optional, Set, Tuple
+
+from dash.exceptions import PreventUpdate
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Inputs changing more often than this only run the last change; the earlier requests
+# return as soon as a newer one arrives rather than holding a thread for the wait
+DEBOUNCE_SECONDS: Final = 0.25
+STATEMENT_TIMEOUT_MS: Final = 15_000
+MAX_TRACKED_SLOTS: Final = 10_000
+# SQLSTATE of a statement stopped by pg_cancel_backend or statement_timeout
+QUERY_CANCELED: Final = "57014"
+
+
+class Superseded(PreventUpdate):
+    """Raised inside a callback whose request a newer one replaced; dash answers it
+    with a no-update response
+    """
+
+
+class _Slot:
+    """Latest sequence number of one (session, channel), the backend running its
+    statement, if any, and the backends being cancelled
+    """
+
+    def __init__(self) -> None:
+        self.seq = 0
+        self.pid: Optional[int] = None
+        self.cancelling: Set[int] = set()
+        self.lock = threading.Lock()
+        # Notified on every new request, waking debounced ones it replaces, and on
+        # every finished cancel
+        self.changed = threading.Condition(self.lock)
+
+
+class RequestGuard:
+    """Per-session request sequencing for the callbacks of one process"""
+
+    def __init__(
+        self,
+        db: SQLAlchemy,
+        statement_timeout_ms: int = STATEMENT_TIMEOUT_MS,
+        max_slots: int = MAX_TRACKED_SLOTS,
+    ) -> None:
+        self.db = db
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_slots = max_slots
+        self.cancelled = 0
+        self.dropped = 0
+        self._slots: "OrderedDict[Tuple[str, str], _Slot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _slot(self, session_id: str, channel: str) -> _Slot:
+        key = (session_id, channel)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = _Slot()
+                while len(self._slots) > self.max_slots:
+                    self._slots.popitem(last=False)
+            self._slots.move_to_end(key)
+        return slot
+
+    def begin(
+        self,
+        session_id: Optional[str],
+        channel: str,
+        debounce: float = 0.0,
+    ) -> int:
+        """Starts a request, cancelling the statement of the one it replaces; with a
+        debounce, waits that long and gives up as soon as another request arrives, so
+        only the latest of a burst holds its thread for the whole wait
+
+        Args:
+            session_id (Optional[str]): browser tab, None disables sequencing
+            channel (str): callback name
+            debounce (float, optional): seconds to wait first. Defaults to 0.0.
+
+        Raises:
+            Superseded: a newer request arrived during the debounce
+
+        Returns:
+            int: sequence number of this request
+        """
+        if session_id is None:
+            return 0
+        slot = self._slot(session_id, channel)
+        with slot.lock:
+            slot.seq += 1
+            seq = slot.seq
+            slot.changed.notify_all()
+            pid, slot.pid = slot.pid, None
+            if pid is not None:
+                slot.cancelling.add(pid)
+        if pid is not None:
+            # Outside the lock, so the session's other requests don't wait on the
+            # round trip; the old request holds its connection until this is done
+            try:
+                self._cancel(pid)
+            finally:
+                with slot.lock:
+                    slot.cancelling.discard(pid)
+                    slot.changed.notify_all()
+        if debounce:
+            with slot.lock:
+                slot.changed.wait_for(lambda: slot.seq != seq, timeout=debounce)
+        self.check(session_id, channel, seq)
+        return seq
+
+    def is_current(self, session_id: Optional[str], channel: str, seq: int) -> bool:
+        """Whether no newer request of the session has started
+
+        Args:
+            session_id (Optional[str]): browser tab
+            channel (str): callback name
+            seq (int): output of begin
+
+        Returns:
+            bool: True if this is still the latest request
+        """
+        return session_id is None or self._slot(session_id, channel).seq == seq
+
+    def check(self, session_id: Optional[str], channel: str, seq: int) -> None:
+        """Stops a request that has been replaced; call before anything expensive
+
+        Args:
+            session_id (Optional[str]): browser tab
+            channel (str): callback name
+            seq (int): output of begin
+
+        Raises:
+            Superseded: a newer request has started
+        """
+        if not self.is_current(session_id, channel, seq):
+            self.dropped += 1
+            raise Superseded
+
+    @contextmanager
+    def statement(
+        self, session_id: Optional[str], channel: str, seq: int
+    ) -> Iterator[None]:
+        """Runs the enclosed queries cancellably: the session's backend is registered
+        so a newer request can cancel it, and a statement_timeout applies
+
+        Args:
+            session_id (Optional[str]): browser tab
+            channel (str): callback name
+            seq (int): output of begin
+
+        Raises:
+            Superseded: the statement was cancelled by a newer request, or one
+            started before it began
+        """
+        session = self.db.session
+        if self.db.engine.dialect.name != "postgresql":
+            self.check(session_id, channel, seq)
+            yield
+            return
+        connection = session.connection()
+        connection.execute(
+            text(f"SET LOCAL statement_timeout = {int(self.statement_timeout_ms)}")
+        )
+        pid = connection.connection.get_backend_pid()
+        slot = self._slot(session_id, channel) if session_id is not None else None
+        if slot is not None:
+            with slot.lock:
+                if slot.seq != seq:
+                    self.dropped += 1
+                    raise Superseded
+                slot.pid = pid
+        try:
+            yield
+        except OperationalError as e:
+            session.rollback()
+            if getattr(e.orig, "pgcode", None) == QUERY_CANCELED and (
+                not self.is_current(session_id, channel, seq)
+            ):
+                raise Superseded from e
+            raise
+        finally:
+            if slot is not None:
+                # A cancel still in flight must land before the connection goes
+                # back to the pool for another request
+                with slot.lock:
+                    if slot.pid == pid:
+                        slot.pid = None
+                    slot.changed.wait_for(lambda: pid not in slot.cancelling)
+
+    def _cancel(self, pid: int) -> None:
+        """Cancels whatever statement the backend is running; a no-op if it's idle"""
+        try:
+            with self.db.engine.connect() as connection:
+                connection.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+            self.cancelled += 1
+        except OperationalError:
+            # The stale request still ends at its next check or its timeout
+            pass
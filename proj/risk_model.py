@@ -0,0 +1,106 @@
+"""This module holds the factor risk model used by the risk-constrained optimization.
+Bond return covariance is represented as exposures @ factor_cov @ exposures.T plus a
+diagonal of specific variance and is never formed densely, so memory grows with
+bonds x factors. Returns are expressed in bp per month.
+"""
+
+from typing import Final, List
+
+import numpy as np
+import pandas as pd
+
+# Without a return history we use structural factor vols (bp of spread or yield per
+# month); these need to be maintained manually, as with the rating/dur_cell orders
+RATES_VOL: Final = 20.0
+SECTOR_SPREAD_VOL: Final = 10.0
+RATING_SPREAD_VOL: Final = {"AAA": 4.0, "AA": 6.0, "A": 9.0, "BBB": 14.0}
+# Idiosyncratic spread vol as a fraction of the bond's OAS per month
+SPECIFIC_SPREAD_VOL: Final = 0.08
+
+
+class FactorRiskModel:
+    """Low rank plus diagonal covariance of bond returns, in the order of the universe
+    it was built from
+    """
+
+    def __init__(
+        self,
+        exposures: np.ndarray,
+        factor_cov: np.ndarray,
+        specific_var: np.ndarray,
+        benchmark: np.ndarray,
+        factor_names: List[str],
+    ) -> None:
+        self.exposures = exposures
+        self.factor_cov = factor_cov
+        self.specific_var = specific_var
+        self.benchmark = benchmark
+        self.factor_names = factor_names
+
+    @classmethod
+    def from_universe(cls, df: pd.DataFrame) -> "FactorRiskModel":
+        """Builds the model from main_table columns: a rates factor plus a spread factor
+        per sector (class_2) and rating, all with effdur as the sensitivity, and
+        specific spread risk proportional to OAS. The benchmark is the market value
+        weighted universe
+
+        Args:
+            df (pd.DataFrame): bonds with class_2, rating, effdur, oas and mv
+
+        Returns:
+            FactorRiskModel: risk model for the bonds in df, in order
+        """
+        effdur = df["effdur"].to_numpy(dtype=float)
+        sectors = sorted(df["class_2"].unique())
+        ratings = sorted(df["rating"].unique())
+        factor_names = (
+            ["rates"]
+            + [f"sector_{x}" for x in sectors]
+            + [f"rating_{x}" for x in ratings]
+        )
+        # A 1bp widening/rise costs effdur bp of return
+        exposures = -effdur[:, None] * np.column_stack(
+            [np.ones(len(df))]
+            + [(df["class_2"] == x).to_numpy() for x in sectors]
+            + [(df["rating"] == x).to_numpy() for x in ratings]
+        )
+        default_rating_vol = max(RATING_SPREAD_VOL.values())
+        factor_vols = np.array(
+            [RATES_VOL]
+            + [SECTOR_SPREAD_VOL] * len(sectors)
+            + [RATING_SPREAD_VOL.get(x, default_rating_vol) for x in ratings]
+        )
+        specific_var = (
+            effdur * SPECIFIC_SPREAD_VOL * df["oas"].to_numpy(dtype=float)
+        ) ** 2
+        mv = df["mv"].to_numpy(dtype=float)
+        benchmark = mv / mv.sum() if mv.sum() > 0 else np.zeros(len(df))
+        return cls(
+            exposures, np.diag(factor_vols**2), specific_var, benchmark, factor_names
+        )
+
+    def variance(self, wts: np.ndarray) -> float:
+        """Portfolio return variance, bp^2
+
+        Args:
+            wts (np.ndarray): weights, or active weights for tracking error
+
+        Returns:
+            float: variance
+        """
+        factor_exposure = self.exposures.T @ wts
+        return float(
+            factor_exposure @ self.factor_cov @ factor_exposure
+            + self.specific_var @ wts**2
+        )
+
+    def volatility(self, wts: np.ndarray) -> float:
+        """Portfolio return volatility, bp per month
+
+        Args:
+            wts (np.ndarray): weights, or active weights for tracking error
+
+        Returns:
+            float: volatility
+        """
+        return float(np.sqrt(max(self.variance(wts), 0.0)))
@@ -0,0 +1,208 @@
+"""This module serializes what the callbacks and the layout send to the browser. Dash
+encodes every response with plotly's PlotlyJSONEncoder, which converts NumPy values,
+Decimals and dates one Python object at a time in Python and then encodes, parses and
+encodes the result again to turn NaN into null. Here every callback's return value goes
+through orjson first: NumPy arrays and scalars, dates and datetimes are written
+natively and NaN as null, while Decimals, figures and components go through a small
+default hook, and the result is read back as plain lists, dicts, strings and numbers.
+Dash's own dispatch and encoder then only see types its C encoder handles directly.
+The layout is encoded by orjson outright.
+
+Responses larger than COMPRESS_MIN_SIZE are compressed with Brotli, or gzip for
+clients without it. The serialize time (the time a callback request spends outside
+the callback itself), JSON bytes and bytes on the wire of every callback are kept for
+/payloads, and each response reports its serialize time in a Server-Timing header.
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Final, List, Optional
+
+import dash
+import flask
+import orjson
+from flask_compress import Compress
+from plotly.utils import PlotlyJSONEncoder
+
+JSON_OPTIONS: Final = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+COMPRESS_ALGORITHMS: Final = ["br", "gzip"]
+# Flask-Compress' default; the max of 11 costs more time than it saves on the wire
+BROTLI_LEVEL: Final = 4
+LAYOUT_NAME: Final = "layout"
+NO_UPDATE_TYPE: Final = type(dash.no_update)
+
+_fallback = PlotlyJSONEncoder()
+
+
+def _default(obj: Any) -> Any:
+    """Everything orjson doesn't write natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    # Figures, components, pandas values, non-contiguous or object arrays
+    return _fallback.default(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes a response body
+
+    Args:
+        obj (Any): callback response or layout
+
+    Returns:
+        bytes: UTF-8 JSON, with NaN and infinities as null
+    """
+    return orjson.dumps(obj, default=_default, option=JSON_OPTIONS)
+
+
+class PayloadStats:
+    """Serialize time and response sizes per callback; safe to share between threads"""
+
+    def __init__(self) -> None:
+        self._stats: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0, 0])
+        self._lock = threading.Lock()
+
+    def record(
+        self, name: str, serialize_s: float, json_bytes: int, wire_bytes: int
+    ) -> None:
+        """Adds one response
+
+        Args:
+            name (str): callback name
+            serialize_s (float): seconds spent encoding
+            json_bytes (int): size of the JSON body
+            wire_bytes (int): size sent, after compression
+        """
+        with self._lock:
+            stats = self._stats[name]
+            stats[0] += 1
+            stats[1] += serialize_s
+            stats[2] = max(stats[2], serialize_s)
+            stats[3] += json_bytes
+            stats[4] += wire_bytes
+
+    def report(self) -> List[dict]:
+        """Callbacks spending the most time serializing first
+
+        Returns:
+            List[dict]: calls, mean and max serialize time and mean sizes per callback
+        """
+        with self._lock:
+            stats = {x: list(y) for x, y in self._stats.items()}
+        return [
+            {
+                "callback": name,
+                "calls": calls,
+                "serialize_ms": total_s / calls * 1000,
+                "max_serialize_ms": max_s * 1000,
+                "json_bytes": json_bytes / calls,
+                "wire_bytes": wire_bytes / calls,
+                "compression_ratio": json_bytes / wire_bytes if wire_bytes else None,
+            }
+            for name, (calls, total_s, max_s, json_bytes, wire_bytes) in sorted(
+                stats.items(), key=lambda x: -x[1][1]
+            )
+        ]
+
+
+def to_plain(value: Any) -> Any:
+    """A callback output as the lists, dicts, strings and numbers it encodes to
+
+    Args:
+        value (Any): output value, or the tuple of them of a multi-output callback
+
+    Returns:
+        Any: the value read back from dumps; no_update, and values dumps can't encode,
+        are left for dash, which reports the latter as an invalid return value
+    """
+    if isinstance(value, NO_UPDATE_TYPE):
+        return value
+    try:
+        return orjson.loads(dumps(value))
+    except TypeError:
+        if isinstance(value, (list, tuple)):
+            # Multi or wildcard outputs holding no_update
+            return [to_plain(x) for x in value]
+        return value
+
+
+class SerializingDash(dash.Dash):
+    """Dash app whose callback return values are converted by to_plain, whose layout is
+    encoded by dumps, and whose responses are compressed and recorded in payload_stats
+
+    Args:
+        compress (bool, optional): Brotli/gzip responses. Defaults to True.
+        Other arguments are those of dash.Dash.
+    """
+
+    def __init__(self, *args, compress: bool = True, **kwargs) -> None:
+        # Set before dash.Dash.__init__, which calls init_app
+        self.payload_stats = PayloadStats()
+        self._compress_payloads = compress
+        super().__init__(*args, compress=False, **kwargs)
+
+    def init_app(self, app: Optional[flask.Flask] = None) -> None:
+        super().init_app(app)
+        server = self.server
+        # Registered before Compress so it runs after it and sees the wire size
+        server.after_request(self._record_payload)
+        if self._compress_payloads:
+            # dash.Dash always restricts this to gzip
+            server.config["COMPRESS_ALGORITHM"] = COMPRESS_ALGORITHMS
+            server.config.setdefault("COMPRESS_BR_LEVEL", BROTLI_LEVEL)
+            Compress(server)
+
+        @server.route("/payloads")
+        def list_payloads() -> flask.Response:
+            return flask.jsonify(self.payload_stats.report())
+
+    def _record_payload(self, response: flask.Response) -> flask.Response:
+        payload = flask.g.pop("payload", None)
+        if payload is not None:
+            name, elapsed, json_bytes = payload
+            self.payload_stats.record(
+                name, elapsed, json_bytes, response.content_length or 0
+            )
+        return response
+
+    def _timed(self, name: str, elapsed: float, response: flask.Response) -> None:
+        response.headers["Server-Timing"] = f"serialize;dur={elapsed * 1000:.2f}"
+        flask.g.payload = (name, elapsed, response.content_length)
+
+    def callback(self, *_args, **_kwargs):
+        """dash.Dash.callback, registering the function wrapped so its return value
+        goes through to_plain and its run time is known to dispatch
+        """
+        register = super().callback(*_args, **_kwargs)
+
+        def wrap_func(func):
+            @functools.wraps(func)
+            def run(*args, **kwargs):
+                flask.g.callback_name = func.__name__
+                start = time.perf_counter()
+                try:
+                    output_value = func(*args, **kwargs)
+                finally:
+                    flask.g.callback_s = time.perf_counter() - start
+                return to_plain(output_value)
+
+            return register(run)
+
+        return wrap_func
+
+    def serve_layout(self) -> flask.Response:
+        start = time.perf_counter()
+        layout = self.layout() if callable(self.layout) else self.layout
+        response = flask.Response(dumps(layout), mimetype="application/json")
+        self._timed(LAYOUT_NAME, time.perf_counter() - start, response)
+        return response
+
+    def dispatch(self) -> flask.Response:
+        """dash.Dash.dispatch, timing everything but the callback as serialization"""
+        start = time.perf_counter()
+        response = super().dispatch()
+        elapsed = time.perf_counter() - start - flask.g.pop("callback_s", 0.0)
+        self._timed(flask.g.pop("callback_name", "callback"), elapsed, response)
+        return response
@@ -3,25 +3,44 @@ only have one tab.
 """
 
 import datetime as dt
+import uuid
 from typing import Final, List
 
 import dash_core_components as dcc
 import dash_html_components as html
-from dash_table import DataTable
+from dash_table import DataTable, FormatTemplate
+from dash_table.Format import Format, Scheme
 import dash_bootstrap_components as dbc
 
+from portfolio_analytics import ANALYTICS_MEASURES
+from summary_stats import (
+    BREAKDOWN_DIMENSIONS,
+    MEASURE_LABELS,
+    SUMMARY_MEASURES,
+    SUMMARY_QUANTILES,
+    stat_names,
+)
 
 SUMMARY_PLACEHOLDER_WIDTH: Final = "2%"
 SUMMARY_COMPONENT_WIDTH: Final = "18%"
 OPT_COL_WIDTH: Final = 3
+CATALOG_POLL_MS: Final = 60_000
 
 
 def generate_summary_layout(
-    dates: List[dt.date], ratings: List[str], dur_cells: List[str]
+    dates: List[dt.date],
+    ratings: List[str],
+    dur_cells: List[str],
+    catalog_version: int = 0,
 ):
     layout = html.Div(
         [
             html.H1("Bond summary and optimization tool"),
+            # Picks up dates loaded while the page is open
+            dcc.Interval(id="catalog_poll", interval=CATALOG_POLL_MS),
+            dcc.Store(id="catalog_version", data=catalog_version),
+            # Identifies this tab so superseded requests from it can be dropped
+            dcc.Store(id="session_id", data=uuid.uuid4().hex),
             # Vertical spacing placeholder
             html.Div(style={"height": "50px"}),
             html.H3("Bond selections for summary and optimization"),
@@ -159,21 +178,51 @@ def generate_summary_layout(
                     ),
                     DataTable(
                         id="summary_table",
-                        columns=[
-                            {"name": x, "id": x.lower()}
-                            for x in [
-                                "Measure",
-                                "Minimum",
-                                "Average",
-                                "Median",
-                                "Maximum",
-                            ]
+                        columns=[{"name": "Measure", "id": "measure"}]
+                        + [
+                            {"name": name, "id": stat_id}
+                            for name, stat_id in stat_names(SUMMARY_QUANTILES)
                         ],
                     ),
                 ]
             ),
             # Spacing placeholder
             html.Div(style={"height": "50px"}),
+            html.H3("Breakdown"),
+            html.Label("Group by one or two of"),
+            html.Div(
+                dcc.Dropdown(
+                    id="breakdown_dims",
+                    options=[
+                        {"label": y, "value": x}
+                        for x, y in BREAKDOWN_DIMENSIONS.items()
+                    ],
+                    value=["class_2"],
+                    multi=True,
+                ),
+                style={"width": "36%"},
+            ),
+            html.Div(id="breakdown_message"),
+            DataTable(id="breakdown_table", sort_action="native", page_size=30),
+            # Spacing placeholder
+            html.Div(style={"height": "50px"}),
+            html.H3("Summary history"),
+            html.Div(
+                dcc.Dropdown(
+                    id="history_measure",
+                    options=[
+                        {"label": MEASURE_LABELS[x], "value": x}
+                        for x in [*SUMMARY_MEASURES, "mv"]
+                    ]
+                    + [{"label": "Number of bonds", "value": "count"}],
+                    value="oas",
+                    clearable=False,
+                ),
+                style={"width": SUMMARY_COMPONENT_WIDTH},
+            ),
+            dcc.Graph(id="summary_history"),
+            # Spacing placeholder
+            html.Div(style={"height": "50px"}),
             html.H3("Optimization controls"),
             html.Div(
                 [
@@ -247,6 +296,45 @@ def generate_summary_layout(
                             ),
                         ],
                     ),
+                    dbc.Row(
+                        [
+                            dbc.Col(html.Label("Risk limit"), width=OPT_COL_WIDTH),
+                            dbc.Col(
+                                html.Label("Risk cap (bp per month)"),
+                                width=OPT_COL_WIDTH,
+                            ),
+                        ],
+                    ),
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id="risk_mode",
+                                    options=[
+                                        {"label": "None", "value": "none"},
+                                        {"label": "Volatility", "value": "volatility"},
+                                        {
+                                            "label": "Tracking error",
+                                            "value": "tracking_error",
+                                        },
+                                    ],
+                                    value="none",
+                                    clearable=False,
+                                ),
+                                width=OPT_COL_WIDTH,
+                            ),
+                            dbc.Col(
+                                dbc.Input(
+                                    id="risk_cap",
+                                    type="number",
+                                    min=0,
+                                    value=120,
+                                    step=1,
+                                ),
+                                width=OPT_COL_WIDTH,
+                            ),
+                        ],
+                    ),
                 ]
             ),
             # Vertical spacing placeholder
@@ -271,6 +359,12 @@ def generate_summary_layout(
                         ),
                         style={"width": SUMMARY_COMPONENT_WIDTH},
                     ),
+                    html.Div(style={"height": "20px"}),
+                    html.Label("Constraint sensitivity"),
+                    html.Div(
+                        DataTable(id="opt_sensitivity"),
+                        style={"width": "60%"},
+                    ),
                 ],
             ),
             # Vertical spacing placeholder
@@ -305,6 +399,143 @@ def generate_summary_layout(
                     ),
                 ]
             ),
+            # Vertical spacing placeholder
+            html.Div(style={"height": "30px"}),
+            html.H3("Portfolio analytics"),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.Label("Characteristics"),
+                            DataTable(
+                                id="opt_characteristics",
+                                columns=[
+                                    {"name": "Measure", "id": "measure"},
+                                    {
+                                        "name": "Weighted average",
+                                        "id": "value",
+                                        "type": "numeric",
+                                        "format": Format(
+                                            precision=4, scheme=Scheme.fixed
+                                        ),
+                                    },
+                                ],
+                            ),
+                        ],
+                        width=OPT_COL_WIDTH,
+                    ),
+                    dbc.Col(
+                        [
+                            html.Label("Contributions by sector, rating and duration"),
+                            DataTable(
+                                id="opt_contributions",
+                                columns=[
+                                    {"name": "Dimension", "id": "dimension"},
+                                    {"name": "Group", "id": "group"},
+                                    {
+                                        "name": "Weight",
+                                        "id": "wt",
+                                        "type": "numeric",
+                                        "format": FormatTemplate.percentage(2),
+                                    },
+                                ]
+                                + [
+                                    {
+                                        "name": f"{MEASURE_LABELS[x]} contribution",
+                                        "id": x,
+                                        "type": "numeric",
+                                        "format": Format(
+                                            precision=4, scheme=Scheme.fixed
+                                        ),
+                                    }
+                                    for x in ANALYTICS_MEASURES
+                                ],
+                                page_size=30,
+                            ),
+                        ]
+                    ),
+                ]
+            ),
+            html.Div(style={"height": "20px"}),
+            html.Label("Largest holdings"),
+            DataTable(
+                id="opt_top_holdings",
+                columns=[
+                    {"name": "Cusip", "id": "cusip"},
+                    {"name": "Ticker", "id": "ticker"},
+                    {"name": BREAKDOWN_DIMENSIONS["class_2"], "id": "class_2"},
+                    {"name": BREAKDOWN_DIMENSIONS["rating"], "id": "rating"},
+                    {
+                        "name": "Weight",
+                        "id": "wts",
+                        "type": "numeric",
+                        "format": FormatTemplate.percentage(2),
+                    },
+                ]
+                + [
+                    {
+                        "name": MEASURE_LABELS[x],
+                        "id": x,
+                        "type": "numeric",
+                        "format": Format(precision=4, scheme=Scheme.fixed),
+                    }
+                    for x in ANALYTICS_MEASURES
+                ],
+            ),
+            # Vertical spacing placeholder
+            html.Div(style={"height": "50px"}),
+            html.H3("Spread scenarios"),
+            html.Label(
+                "One scenario per line as name: shock, shock; a shock is a sector, "
+                "rating or ALL with an OAS move in bp"
+            ),
+            dcc.Textarea(
+                id="scenario_text",
+                value="Financials wider: FINANCIAL=+50\n"
+                "BBB wider: BBB=+40, A=+15\n"
+                "Broad rally: ALL=-20",
+                style={"width": "60%", "height": "100px"},
+            ),
+            html.Div(style={"height": "20px"}),
+            html.Button(
+                "Run scenarios",
+                id="scenario_button",
+                style={"height": "50px", "width": "200px"},
+            ),
+            html.Div(style={"height": "20px"}),
+            html.Div(id="scenario_message"),
+            DataTable(id="scenario_results"),
+            # Vertical spacing placeholder
+            html.Div(style={"height": "50px"}),
+            html.H3("Compare runs"),
+            html.Label("Run ids are listed with each optimization result"),
+            dbc.Row(
+                [
+                    dbc.Col(html.Label("Earlier run"), width=OPT_COL_WIDTH),
+                    dbc.Col(html.Label("Later run"), width=OPT_COL_WIDTH),
+                ]
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dbc.Input(id="diff_old_run", type="number", min=1, step=1),
+                        width=OPT_COL_WIDTH,
+                    ),
+                    dbc.Col(
+                        dbc.Input(id="diff_new_run", type="number", min=1, step=1),
+                        width=OPT_COL_WIDTH,
+                    ),
+                ]
+            ),
+            html.Div(style={"height": "20px"}),
+            html.Button(
+                "Compare",
+                id="diff_button",
+                style={"height": "50px", "width": "200px"},
+            ),
+            html.Div(style={"height": "20px"}),
+            html.Div(id="diff_message"),
+            DataTable(id="diff_results", page_size=50),
         ],
         style={"marginLeft": 5, "width": "95%"},
     )
@@ -0,0 +1,394 @@
+"""This module holds the summary statistics engine. Statistics are described by a list
+of measures and quantiles and computed in a single pass, vectorized over the arrays of
+a date's universe already in memory, which is turned into the summary table rows here.
+Charting the statistics through time reads every date, so that one is a SELECT against
+the bond table grouped by eff_date producing the same flat sequence per date. The
+in-memory path can also be grouped by up to two dimensions for the breakdown table.
+"""
+
+from typing import Dict, Final, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from dash_table import FormatTemplate
+from dash_table.Format import Format, Scheme
+from flask_sqlalchemy import Model
+from sqlalchemy import select
+from sqlalchemy.sql import Select, func
+
+MEASURE_LABELS: Final = {
+    "oas": "OAS",
+    "ytm": "YTM",
+    "effdur": "Duration",
+    "mv": "Market value",
+}
+SUMMARY_MEASURES: Final = ("oas", "ytm", "effdur")
+SUMMARY_QUANTILES: Final = (0.25, 0.5, 0.75)
+BREAKDOWN_DIMENSIONS: Final = {
+    "class_1": "Class 1",
+    "class_2": "Class 2",
+    "class_3": "Class 3",
+    "class_4": "Class 4",
+    "rating": "Rating",
+    "dur_cell": "Duration cell",
+}
+BREAKDOWN_MEASURES: Final = ("oas", "ytm")
+MAX_BREAKDOWN_DIMENSIONS: Final = 2
+
+
+def quantile_id(quantile: float) -> str:
+    """Column id for a quantile, median for 0.5 and pNN otherwise
+
+    Args:
+        quantile (float): quantile in [0, 1]
+
+    Returns:
+        str: column id, ex p25
+    """
+    return "median" if quantile == 0.5 else f"p{quantile * 100:g}"
+
+
+def stat_names(quantiles: Sequence[float]) -> List[Tuple[str, str]]:
+    """Ordered (name, id) pairs of the statistics computed for every measure
+
+    Args:
+        quantiles (Sequence[float]): quantiles to compute
+
+    Returns:
+        List[Tuple[str, str]]: column name and id pairs
+    """
+    return (
+        [("Minimum", "minimum"), ("Average", "average")]
+        + [
+            ("Median" if q == 0.5 else f"{q * 100:g}th pct", quantile_id(q))
+            for q in quantiles
+        ]
+        + [("Maximum", "maximum")]
+    )
+
+
+def _summary_columns(
+    Bond: Model, measures: Sequence[str], quantiles: Sequence[float]
+) -> list:
+    """Aggregate expressions in the flat layout described in summarize_arrays"""
+    columns = []
+    for measure in measures:
+        col = getattr(Bond, measure)
+        columns += [
+            func.min(col),
+            func.avg(col),
+            *[func.percentile_cont(q).within_group(col.asc()) for q in quantiles],
+            func.max(col),
+        ]
+    return columns + [func.sum(Bond.mv), func.count(Bond.mv)]
+
+
+def summary_series_select(
+    Bond: Model,
+    where_clauses: list,
+    measures: Sequence[str] = SUMMARY_MEASURES,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> Select:
+    """Builds one SELECT computing every statistic of every measure for every eff_date
+    at once, grouped in a single scan rather than one query per date; postgres shares
+    the sorted input between percentile_cont calls on the same column
+
+    Args:
+        Bond (Model): bond model
+        where_clauses (list): filters to apply, not including eff_date
+        measures (Sequence[str], optional): Bond columns to summarize. Defaults to
+        SUMMARY_MEASURES.
+        quantiles (Sequence[float], optional): quantiles per measure. Defaults to
+        SUMMARY_QUANTILES.
+
+    Returns:
+        Select: statement returning eff_date followed by the layout described in
+        summarize_arrays, one row per date in date order
+    """
+    return (
+        select(Bond.eff_date, *_summary_columns(Bond, measures, quantiles))
+        .where(*where_clauses)
+        .group_by(Bond.eff_date)
+        .order_by(Bond.eff_date)
+    )
+
+
+def summarize_groups(
+    frame: pd.DataFrame,
+    dimensions: Sequence[str],
+    measures: Sequence[str] = BREAKDOWN_MEASURES,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> List[tuple]:
+    """summarize_arrays for every group of the dimensions, over a universe already in
+    memory
+
+    Args:
+        frame (pd.DataFrame): bonds, must include the dimensions, measures and mv
+        dimensions (Sequence[str]): columns to group by
+        measures (Sequence[str], optional): columns to summarize. Defaults to
+        BREAKDOWN_MEASURES.
+        quantiles (Sequence[float], optional): quantiles per measure. Defaults to
+        SUMMARY_QUANTILES.
+
+    Returns:
+        List[tuple]: the dimension values followed by the summarize_arrays layout,
+        one row per group, groups in no set order
+    """
+    if frame.empty:
+        return []
+    groups = frame.groupby(list(dimensions), sort=False)
+    parts = []
+    for measure in measures:
+        values = groups[measure]
+        by_quantile = values.quantile(list(quantiles)).unstack() if quantiles else {}
+        parts += [
+            values.min(),
+            values.mean(),
+            *[by_quantile[q] for q in quantiles],
+            values.max(),
+        ]
+    stats = pd.concat(parts + [groups["mv"].sum(), groups.size()], axis=1)
+    keys = stats.index.to_frame(index=False).itertuples(index=False, name=None)
+    return [(*key, *row) for key, row in zip(keys, stats.itertuples(index=False))]
+
+
+def summarize_arrays(
+    arrays: Dict[str, np.ndarray],
+    measures: Sequence[str] = SUMMARY_MEASURES,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> List[Optional[float]]:
+    """Every statistic of every measure in one vectorized pass over data already in
+    memory; one date of summary_series_select gives the same values
+
+    Args:
+        arrays (Dict[str, np.ndarray]): column name to values, must include mv
+        measures (Sequence[str], optional): columns to summarize. Defaults to
+        SUMMARY_MEASURES.
+        quantiles (Sequence[float], optional): quantiles per measure. Defaults to
+        SUMMARY_QUANTILES.
+
+    Returns:
+        List[Optional[float]]: min, average, quantiles and max for each measure
+        followed by the market value sum and bond count; None where SQL gives NULL
+    """
+    result: List[Optional[float]] = []
+    for measure in measures:
+        values = np.asarray(arrays[measure], dtype=float)
+        if values.size == 0:
+            result += [None] * (len(quantiles) + 3)
+            continue
+        result += [
+            float(values.min()),
+            float(values.mean()),
+            # Linear interpolation matches percentile_cont
+            *np.quantile(values, quantiles).tolist(),
+            float(values.max()),
+        ]
+    mv = np.asarray(arrays["mv"], dtype=float)
+    result += [float(mv.sum()) if mv.size else None, int(mv.size)]
+    return result
+
+
+def summary_tables(
+    result: Sequence[Optional[float]],
+    measures: Sequence[str] = SUMMARY_MEASURES,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> Tuple[
+    List[Dict[str, Union[str, float]]],
+    List[dict],
+    List[Dict[str, Union[int, float]]],
+    List[dict],
+]:
+    """Turns the flat statistics into summary table and totals table data/columns
+
+    Args:
+        result (Sequence[Optional[float]]): output of summarize_arrays, or one row
+        of summary_series_select without its eff_date
+        measures (Sequence[str], optional): measures summarized. Defaults to
+        SUMMARY_MEASURES.
+        quantiles (Sequence[float], optional): quantiles summarized. Defaults to
+        SUMMARY_QUANTILES.
+
+    Returns:
+        Tuple[ List[Dict[str, Union[str, float]]], List[dict],
+        List[Dict[str, Union[int, float]]], List[dict], ]: summary data, summary
+        columns, totals data, totals columns
+    """
+    stats = stat_names(quantiles)
+    width = len(stats)
+    rows = [
+        {
+            "measure": MEASURE_LABELS.get(measure, measure),
+            **{stat_id: result[i * width + j] for j, (_, stat_id) in enumerate(stats)},
+        }
+        for i, measure in enumerate(measures)
+    ]
+    mv_sum, count = result[len(measures) * width :]
+    return (
+        rows,
+        [{"name": "Measure", "id": "measure"}]
+        + [
+            {
+                "name": name,
+                "id": stat_id,
+                "type": "numeric",
+                "format": Format(precision=4, scheme=Scheme.fixed),
+            }
+            for name, stat_id in stats
+        ],
+        [{"num_bonds": count, "market_value": mv_sum}],
+        [
+            {
+                "name": "Number of bonds",
+                "id": "num_bonds",
+                "type": "numeric",
+                "format": Format(group=","),
+            },
+            {
+                "name": "Market value",
+                "id": "market_value",
+                "type": "numeric",
+                "format": FormatTemplate.money(2),
+            },
+        ],
+    )
+
+
+def breakdown_tables(
+    rows: Sequence[Sequence],
+    dimensions: Sequence[str],
+    orders: Optional[Dict[str, Dict[str, int]]] = None,
+    measures: Sequence[str] = BREAKDOWN_MEASURES,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> Tuple[List[Dict[str, Union[str, float, None]]], List[dict]]:
+    """Breakdown table data/columns: count, market value and the quantiles of every
+    measure per group
+
+    Args:
+        rows (Sequence[Sequence]): output of summarize_groups
+        dimensions (Sequence[str]): dimensions grouped by
+        orders (Optional[Dict[str, Dict[str, int]]], optional): display order of the
+        values of a dimension, ex RATING_ORDER for rating; unlisted values and
+        dimensions sort alphabetically after. Defaults to None.
+        measures (Sequence[str], optional): measures summarized. Defaults to
+        BREAKDOWN_MEASURES.
+        quantiles (Sequence[float], optional): quantiles summarized. Defaults to
+        SUMMARY_QUANTILES.
+
+    Returns:
+        Tuple[List[Dict[str, Union[str, float, None]]], List[dict]]: data, columns
+    """
+    orders = orders or {}
+    stats = stat_names(quantiles)
+    width = len(stats)
+    ndims = len(dimensions)
+    # Positions of the quantiles within each measure's block
+    quantile_stats = [
+        (j, name, stat_id)
+        for j, (name, stat_id) in enumerate(stats)
+        if stat_id not in ("minimum", "average", "maximum")
+    ]
+
+    def sort_key(row: Sequence) -> tuple:
+        return tuple(
+            (orders.get(dim, {}).get(value, len(orders.get(dim, {}))), str(value))
+            for dim, value in zip(dimensions, row)
+        )
+
+    data = []
+    for row in sorted(rows, key=sort_key):
+        mv_sum, count = row[ndims + len(measures) * width :]
+        record = {dim: value for dim, value in zip(dimensions, row)}
+        record["num_bonds"] = int(count)
+        # Numeric columns come back as Decimal from the database
+        record["market_value"] = None if mv_sum is None else float(mv_sum)
+        for i, measure in enumerate(measures):
+            for j, _, stat_id in quantile_stats:
+                value = row[ndims + i * width + j]
+                record[f"{measure}_{stat_id}"] = (
+                    None if value is None or value != value else float(value)
+                )
+        data.append(record)
+    fixed = Format(precision=2, scheme=Scheme.fixed)
+    columns = (
+        [{"name": BREAKDOWN_DIMENSIONS.get(x, x), "id": x} for x in dimensions]
+        + [
+            {
+                "name": "Number of bonds",
+                "id": "num_bonds",
+                "type": "numeric",
+                "format": Format(group=","),
+            },
+            {
+                "name": "Market value",
+                "id": "market_value",
+                "type": "numeric",
+                "format": FormatTemplate.money(0),
+            },
+        ]
+        + [
+            {
+                "name": f"{MEASURE_LABELS.get(measure, measure)} {name.lower()}",
+                "id": f"{measure}_{stat_id}",
+                "type": "numeric",
+                "format": fixed,
+            }
+            for measure in measures
+            for _, name, stat_id in quantile_stats
+        ]
+    )
+    return data, columns
+
+
+def summary_figure(
+    rows: Sequence[Sequence],
+    measure: str,
+    measures: Sequence[str] = SUMMARY_MEASURES,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> dict:
+    """Line chart of one measure through time from the rows of summary_series_select;
+    the average and quantiles of a measure, or the total market value / bond count
+
+    Args:
+        rows (Sequence[Sequence]): eff_date followed by the flat statistics
+        measure (str): one of measures, mv for market value or count for bonds
+        measures (Sequence[str], optional): measures summarized. Defaults to
+        SUMMARY_MEASURES.
+        quantiles (Sequence[float], optional): quantiles summarized. Defaults to
+        SUMMARY_QUANTILES.
+
+    Returns:
+        dict: plotly figure
+    """
+    dates = [row[0] for row in rows]
+    stats = stat_names(quantiles)
+    width = len(stats)
+    if measure in measures:
+        offset = 1 + measures.index(measure) * width
+        # Minimum and maximum squash the quantiles, leave them to the table
+        traces = [
+            (name, offset + j)
+            for j, (name, stat_id) in enumerate(stats)
+            if stat_id not in ("minimum", "maximum")
+        ]
+    elif measure == "mv":
+        traces = [("Market value", 1 + len(measures) * width)]
+    else:
+        traces = [("Number of bonds", 2 + len(measures) * width)]
+    return {
+        "data": [
+            {
+                "type": "scatter",
+                "mode": "lines+markers",
+                "name": name,
+                "x": dates,
+                # Numeric columns come back as Decimal
+                "y": [None if row[i] is None else float(row[i]) for row in rows],
+            }
+            for name, i in traces
+        ],
+        "layout": {
+            "title": MEASURE_LABELS.get(measure, "Number of bonds"),
+            "xaxis": {"title": "Date"},
+        },
+    }
@@ -77,6 +77,26 @@ CREATE TABLE main_table (
     dur_cell text
 );
 
+/* Announce every eff_date a statement touches on the bond_dates channel; running app
+workers LISTEN and refresh just those dates (see proj/data_catalog.py) */
+CREATE FUNCTION notify_bond_dates() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('bond_dates', eff_date::text)
+    FROM (SELECT DISTINCT eff_date FROM changed_rows) AS dates;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER main_table_inserted AFTER INSERT ON main_table
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bond_dates();
+CREATE TRIGGER main_table_updated AFTER UPDATE ON main_table
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bond_dates();
+CREATE TRIGGER main_table_deleted AFTER DELETE ON main_table
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_bond_dates();
+
 /* move to the main table */
 INSERT INTO main_table (
     eff_date, 
@@ -147,3 +167,28 @@ INSERT INTO main_table (
         CAST(mv_tot AS numeric),
         dur_cell
     FROM staging;
+
+/* Optimization runs; holdings keep only non-zero weights */
+CREATE TABLE portfolio_run (
+    run_id SERIAL PRIMARY KEY,
+    created_at timestamp NOT NULL,
+    eff_date date NOT NULL,
+    filters json NOT NULL,
+    metric text NOT NULL,
+    security_bound double precision, -- NULL: no per-security cap
+    duration_target double precision NOT NULL,
+    sector_bound double precision NOT NULL,
+    risk_mode text NOT NULL,
+    risk_cap double precision,
+    objective double precision NOT NULL
+);
+CREATE INDEX ix_portfolio_run_created_at ON portfolio_run (created_at);
+/* Tables created before runs without a security bound were stored need
+ALTER TABLE portfolio_run ALTER COLUMN security_bound DROP NOT NULL; */
+
+CREATE TABLE portfolio_holding (
+    run_id integer REFERENCES portfolio_run (run_id) ON DELETE CASCADE,
+    cusip text,
+    wt double precision NOT NULL,
+    PRIMARY KEY (run_id, cusip)
+);
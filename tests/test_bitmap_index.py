@@ -0,0 +1,80 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+from proj.bitmap_index import BitmapIndex, DateIndex
+
+
+def test_resolve_matches_boolean_filters(universe: pd.DataFrame):
+    index = DateIndex(universe)
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        filters = {
+            dim: list(rng.choice(universe[dim].unique(), rng.integers(0, 3)))
+            for dim in ["class_2", "rating", "dur_cell"]
+        }
+        expected = np.ones(len(universe), dtype=bool)
+        for dim, values in filters.items():
+            if values:
+                expected &= universe[dim].isin(values).to_numpy()
+        assert index.resolve(filters).tolist() == np.flatnonzero(expected).tolist()
+
+
+def test_unfiltered_and_unknown_values(universe: pd.DataFrame):
+    index = DateIndex(universe)
+    assert len(index.resolve({None: ["X"], "rating": None, "dur_cell": []})) == len(
+        universe
+    )
+    assert len(index.resolve({"rating": ["CCC"]})) == 0
+    assert sorted(index.values("rating")) == sorted(universe["rating"].unique())
+
+
+def test_cache_loads_each_date_once(universe: pd.DataFrame):
+    calls = []
+
+    def loader(date_value: dt.date) -> pd.DataFrame:
+        calls.append(date_value)
+        return universe
+
+    index = BitmapIndex(loader, max_dates=1)
+    assert index["2020-02-29"] is index[dt.date(2020, 2, 29)]
+    index[dt.date(2020, 3, 31)]
+    index.invalidate("2020-03-31")
+    index[dt.datetime(2020, 2, 29)]
+    assert calls == [dt.date(2020, 2, 29), dt.date(2020, 3, 31), dt.date(2020, 2, 29)]
+
+
+def test_load_straddling_invalidate_isnt_cached(universe: pd.DataFrame):
+    calls = []
+
+    def loader(date_value: dt.date) -> pd.DataFrame:
+        calls.append(date_value)
+        if len(calls) == 1:
+            # New data lands while the first load is still reading the old
+            index.invalidate(date_value)
+        return universe
+
+    index = BitmapIndex(loader)
+    index["2020-02-29"]
+    index["2020-02-29"]
+    index["2020-02-29"]
+    assert len(calls) == 2
+
+
+@pytest.fixture
+def universe(make_universe) -> pd.DataFrame:
+    return make_universe(
+        1000,
+        0,
+        [
+            "cusip",
+            "class_1",
+            "class_2",
+            "class_3",
+            "class_4",
+            "rating",
+            "dur_cell",
+            "oas",
+        ],
+    )
@@ -0,0 +1,105 @@
+import datetime as dt
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from proj.data_catalog import (
+    DUR_CELL_ORDER,
+    DataCatalog,
+    MarkerSubscriber,
+    notify_date,
+    ordered,
+)
+from proj.db_structure import build_bond
+
+
+def test_ordered_puts_unknown_values_last():
+    assert ordered(["15+", "NEW", "0to3", "ABC"], DUR_CELL_ORDER) == [
+        "0to3",
+        "15+",
+        "ABC",
+        "NEW",
+    ]
+
+
+def test_refresh_date_only_touches_that_date(db: SQLAlchemy, Bond):
+    catalog = DataCatalog(db, Bond)
+    assert catalog.snapshot() == (
+        [dt.date(2020, 1, 31), dt.date(2020, 2, 29)],
+        ["AA", "BBB"],
+        ["0to3", "5to8"],
+    )
+    version = catalog.version
+    _insert(db, Bond, dt.date(2020, 3, 31), "AAA", "15+")
+    # Nothing changes until the date is announced
+    assert catalog.snapshot()[0][-1] == dt.date(2020, 2, 29)
+    catalog.refresh_date(dt.date(2020, 3, 31))
+    dates, ratings, dur_cells = catalog.snapshot()
+    assert dates[-1] == dt.date(2020, 3, 31)
+    assert ratings == ["AAA", "AA", "BBB"] and dur_cells[-1] == "15+"
+    assert catalog.version != version
+    db.session.execute(Bond.__table__.delete().where(Bond.rating == "BBB"))
+    db.session.commit()
+    catalog.refresh_date(dt.date(2020, 1, 31))
+    assert catalog.snapshot()[0] == [dt.date(2020, 2, 29), dt.date(2020, 3, 31)]
+    # BBB is still held on 2020-02-29
+    assert "BBB" in catalog.snapshot()[1]
+
+
+def test_marker_subscriber_dispatches_touched_dates(tmp_path):
+    notify_date(dt.date(2020, 1, 31), marker_dir=str(tmp_path))
+    seen = []
+    subscriber = MarkerSubscriber(str(tmp_path), seen.append, lambda: None)
+    subscriber.poll()
+    # Markers present at start up were already loaded
+    assert seen == []
+    notify_date(dt.date(2020, 3, 31), marker_dir=str(tmp_path))
+    (tmp_path / "not-a-date").touch()
+    subscriber.poll()
+    subscriber.poll()
+    assert seen == [dt.date(2020, 3, 31)]
+
+
+def _insert(db: SQLAlchemy, Bond, date_value: dt.date, rating: str, dur_cell: str):
+    db.session.execute(
+        Bond.__table__.insert(),
+        [
+            {
+                "eff_date": date_value,
+                "class_1": "CORP",
+                "class_2": "FINANCIAL",
+                "class_3": "BANKING",
+                "class_4": "A1",
+                "rating": rating,
+                "dur_cell": dur_cell,
+                "oas": 100,
+                "ytm": 3,
+                "mv": 1e6,
+                "effdur": 4,
+                "cusip": "C00000",
+                "ticker": "ABC",
+                "mat_dt": "1/1/2030",
+            }
+        ],
+    )
+    db.session.commit()
+
+
+@pytest.fixture
+def db() -> SQLAlchemy:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db = SQLAlchemy(app)
+    with app.app_context():
+        yield db
+
+
+@pytest.fixture
+def Bond(db: SQLAlchemy):
+    Bond = build_bond(db)
+    db.create_all()
+    _insert(db, Bond, dt.date(2020, 1, 31), "BBB", "0to3")
+    _insert(db, Bond, dt.date(2020, 2, 29), "AA", "5to8")
+    _insert(db, Bond, dt.date(2020, 2, 29), "BBB", "0to3")
+    return Bond
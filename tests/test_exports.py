@@ -0,0 +1,146 @@
+import datetime as dt
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from proj import exports
+from proj.bitmap_index import BitmapIndex
+from proj.data_catalog import DataCatalog
+from proj.db_structure import build_bond
+from proj.exports import PORTFOLIO_COLUMNS, csv_chunks, register_exports
+from proj.optimization import do_optimization
+
+CHUNK_ROWS = 64
+
+
+def test_csv_export_spans_chunks(client, universe: pd.DataFrame):
+    response = client.get(
+        "/export/universe?date=2020-02-29&class_type=class_2&class=FINANCIAL"
+        "&rating=AA&rating=A"
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert "universe.csv" in response.headers["Content-Disposition"]
+    expected = universe[
+        (universe["class_2"] == "FINANCIAL") & universe["rating"].isin(["AA", "A"])
+    ]
+    assert len(expected) > 2 * CHUNK_ROWS
+    assert len(list(csv_chunks(expected))) > 1
+    result = pd.read_csv(io.BytesIO(response.data))
+    assert list(result.columns) == list(universe.columns)
+    assert list(result["cusip"]) == list(expected["cusip"])
+    assert result["oas"].to_numpy() == pytest.approx(expected["oas"].to_numpy())
+
+
+def test_parquet_export_reads_back(client, universe: pd.DataFrame):
+    response = client.get("/export/universe?date=2020-02-29&format=parquet")
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.data))
+    # One row group per chunk
+    assert table.num_rows == len(universe)
+    assert pq.ParquetFile(io.BytesIO(response.data)).num_row_groups > 1
+    pd.testing.assert_frame_equal(table.to_pandas(), universe)
+
+
+@pytest.mark.parametrize("export_format", ["csv", "parquet"])
+def test_empty_export(client, universe: pd.DataFrame, export_format: str):
+    response = client.get(
+        f"/export/universe?date=2020-02-29&rating=CCC&format={export_format}"
+    )
+    assert response.status_code == 200
+    if export_format == "csv":
+        result = pd.read_csv(io.BytesIO(response.data))
+    else:
+        result = pq.read_table(io.BytesIO(response.data)).to_pandas()
+    assert result.empty and list(result.columns) == list(universe.columns)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "/export/universe",
+        "/export/universe?date=not-a-date",
+        "/export/universe?date=2020-02-29&format=xlsx",
+        "/export/universe?date=2020-02-29&class_type=class_9&class=X",
+        "/export/portfolio?date=2020-02-29&metric=oas",
+        "/export/portfolio?date=2020-02-29&metric=mv&sec_bound=0.03"
+        "&duration_target=5&sector_limit=35",
+    ],
+)
+def test_bad_parameters(client, query: str):
+    assert client.get(query).status_code == 400
+
+
+def test_unknown_dates_are_not_loaded(client, loaded: list):
+    assert client.get("/export/universe?date=2020-02-29").status_code == 200
+    for _ in range(3):
+        assert client.get("/export/universe?date=2019-12-31").status_code == 404
+    assert loaded == [dt.date(2020, 2, 29)]
+
+
+def test_portfolio_export(client, universe: pd.DataFrame):
+    response = client.get(
+        "/export/portfolio?date=2020-02-29&metric=oas&sec_bound=0.03"
+        "&duration_target=5&sector_limit=35"
+    )
+    assert response.status_code == 200
+    assert "portfolio.csv" in response.headers["Content-Disposition"]
+    result = pd.read_csv(io.BytesIO(response.data))
+    assert list(result.columns) == PORTFOLIO_COLUMNS
+    objective, cusip_wts, _, _ = do_optimization(
+        *[
+            universe[universe["class_2"] == x]
+            for x in ["INDUSTRIAL", "FINANCIAL", "UTILITY"]
+        ],
+        0.03,
+        5.0,
+        0.35,
+        "oas",
+    )
+    held = {x: y for x, y in cusip_wts if y > 0}
+    assert dict(zip(result["cusip"], result["wt"])) == pytest.approx(held)
+    assert (result["wt"] * result["oas"]).sum() == pytest.approx(objective)
+    assert list(result["wt"]) == sorted(result["wt"], reverse=True)
+    # A duration no portfolio can reach
+    response = client.get(
+        "/export/portfolio?date=2020-02-29&metric=oas&sec_bound=0.03"
+        "&duration_target=500&sector_limit=35"
+    )
+    assert response.status_code == 422
+
+
+@pytest.fixture
+def loaded() -> list:
+    return []
+
+
+@pytest.fixture
+def client(monkeypatch, universe: pd.DataFrame, loaded: list):
+    monkeypatch.setattr(exports, "EXPORT_CHUNK_ROWS", CHUNK_ROWS)
+
+    def loader(date_value: dt.date) -> pd.DataFrame:
+        loaded.append(date_value)
+        return universe
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db = SQLAlchemy(app)
+    with app.app_context():
+        Bond = build_bond(db)
+        db.create_all()
+        db.session.execute(
+            Bond.__table__.insert(),
+            universe.head(1).assign(eff_date=dt.date(2020, 2, 29)).to_dict("records"),
+        )
+        db.session.commit()
+        register_exports(app, BitmapIndex(loader), DataCatalog(db, Bond))
+        yield app.test_client()
+
+
+@pytest.fixture
+def universe(make_universe) -> pd.DataFrame:
+    return make_universe(1000, 4)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from proj.load_test import (
+    CALLBACK_OUTPUTS,
+    Sample,
+    callback_payload,
+    format_report,
+    summarize,
+)
+
+
+def test_callback_payload_matches_dash_renderer():
+    body = callback_payload(
+        CALLBACK_OUTPUTS["update_class_for_choices"],
+        [("date_filter", "value", "2020-02-29"), ("class_type", "value", "class_2")],
+    )
+    assert body["output"] == (
+        "..class_label.children...class_filter.options"
+        "...class_filter.disabled...class_filter.value.."
+    )
+    assert body["inputs"][1] == {
+        "id": "class_type",
+        "property": "value",
+        "value": "class_2",
+    }
+    assert body["state"] == []
+    assert body["changedPropIds"] == ["date_filter.value"]
+
+
+def test_summarize_percentiles_and_errors():
+    latencies = np.arange(1, 101) / 1000
+    samples = [
+        Sample("update_summary_table", x, i % 10 != 0) for i, x in enumerate(latencies)
+    ]
+    report = summarize(samples, elapsed=4.0)
+    stats = report["update_summary_table"]
+    assert stats["requests"] == 100
+    assert stats["errors"] == 10
+    assert stats["error_rate"] == pytest.approx(0.1)
+    assert stats["throughput"] == pytest.approx(25)
+    assert stats["p50"] == pytest.approx(50.5)
+    assert stats["p99"] == pytest.approx(99.01)
+    assert report["total"]["requests"] == 100
+    assert report["populate_optimization_results"]["p95"] is None
+    assert "update_summary_table" in format_report(report)
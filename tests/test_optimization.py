@@ -1,6 +1,16 @@
 import pytest
+import numpy as np
 import pandas as pd
-from proj.optimization import do_optimization
+from proj import optimization
+from proj.optimization import (
+    SECTORS,
+    FastPathError,
+    do_optimization,
+    fast_optimization,
+    parse_scenarios,
+    run_scenarios,
+    shock_matrix,
+)
 import datetime as dt
 
 
@@ -26,7 +36,7 @@ def test_results_within_bounds(single_date_data: pd.DataFrame):
     dur_target = 3.5
     sector_bound = 0.3
     metric = "oas"
-    res, wts = do_optimization(
+    res, wts, _, _ = do_optimization(
         industrial_df,
         financial_df,
         utility_df,
@@ -48,6 +58,153 @@ def test_results_within_bounds(single_date_data: pd.DataFrame):
     )
 
 
+@pytest.mark.parametrize("seed", range(20))
+def test_fast_path_matches_cbc(seed: int, make_universe):
+    # Random universes across the feasible range of duration targets; the closed form
+    # solver must agree with CBC on feasibility and objective
+    rng = np.random.default_rng(seed)
+    dfs = random_sector_dfs(make_universe, rng, int(rng.integers(5, 80)))
+    security_bound = float(rng.choice([0.01, 0.02, 0.03, 0.1]))
+    sector_bound = float(rng.uniform(0.2, 0.5))
+    dur_target = float(rng.uniform(1, 12))
+    metric = str(rng.choice(["oas", "ytm"]))
+    args = (*dfs, security_bound, dur_target, sector_bound, metric)
+    fast = do_optimization(*args)
+    cbc = do_optimization(*args, use_fast_path=False)
+    assert (fast is None) == (cbc is None)
+    if fast is None:
+        return
+    assert fast[0] == pytest.approx(cbc[0], rel=1e-6, abs=1e-6)
+    wts = pd.DataFrame(fast[1], columns=["cusip", "wt"]).set_index("cusip")
+    wts = wts.join(pd.concat(dfs).set_index("cusip"))
+    assert sum(wts["wt"] * wts["effdur"]) == pytest.approx(dur_target, abs=1e-6)
+    assert wts["wt"].sum() <= 1 + 1e-9
+    assert all(-1e-12 <= wt <= security_bound + 1e-12 for wt in wts["wt"])
+    assert all(c_s <= sector_bound + 1e-9 for c_s in wts.groupby("class_2")["wt"].sum())
+
+
+def test_unconverged_bisection_falls_back_to_cbc(monkeypatch, make_universe):
+    # Out of bisections the bracket isn't certified optimal, so it mustn't be returned
+    monkeypatch.setattr(optimization, "MAX_BISECTIONS", 0)
+    rng = np.random.default_rng(3)
+    dfs = random_sector_dfs(make_universe, rng, 60)
+    df = pd.concat(dfs)
+    with pytest.raises(FastPathError):
+        fast_optimization(
+            df["oas"].to_numpy(),
+            df["effdur"].to_numpy(),
+            np.repeat(np.arange(3), [len(x) for x in dfs]),
+            0.03,
+            5.0,
+            0.35,
+        )
+    args = (*dfs, 0.03, 5.0, 0.35, "oas")
+    assert do_optimization(*args)[0] == pytest.approx(
+        do_optimization(*args, use_fast_path=False)[0], rel=1e-9
+    )
+
+
+def test_no_security_bound(make_universe):
+    # A cleared security bound dropdown means no per-security cap; with the budget
+    # capping every weight at 1 that's the same problem as a bound of 1
+    rng = np.random.default_rng(7)
+    dfs = random_sector_dfs(make_universe, rng, 50)
+    unbounded = do_optimization(*dfs, None, 5.0, 0.35, "oas")
+    bounded = do_optimization(*dfs, 1.0, 5.0, 0.35, "oas", use_fast_path=False)
+    assert unbounded[0] == pytest.approx(bounded[0], rel=1e-6)
+    security_row = unbounded[2][-1]
+    assert security_row["rhs"] is None and security_row["shadow_price"] == 0
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sensitivity_matches_cbc(seed: int, make_universe):
+    # Shadow prices satisfy strong duality and agree with CBC's duals, and the
+    # duration shadow price predicts a re-solve anywhere inside its range
+    rng = np.random.default_rng(seed)
+    dfs = random_sector_dfs(make_universe, rng, 60)
+    args = (*dfs, 0.03, 4.0, 0.35, "oas")
+    fast = do_optimization(*args)
+    cbc = do_optimization(*args, use_fast_path=False)
+    if fast is None:
+        return
+    obj, wts, rows, reduced_costs = fast
+    assert [x["shadow_price"] for x in rows] == pytest.approx(
+        [x["shadow_price"] for x in cbc[2]], rel=1e-4, abs=1e-4
+    )
+    dual_obj = sum(x["rhs"] * x["shadow_price"] for x in rows)
+    assert dual_obj == pytest.approx(obj, rel=1e-6)
+    duration = rows[1]
+    for end in [duration["rhs_lower"], duration["rhs_upper"]]:
+        target = 4.0 + 0.5 * (end - 4.0)
+        moved = do_optimization(*dfs, 0.03, target, 0.35, "oas")
+        assert moved[0] == pytest.approx(
+            obj + duration["shadow_price"] * (target - 4.0), rel=1e-6
+        )
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_duration_multiplier_matches_cbc(seed: int, make_universe):
+    # Loose sector bounds leave the budget slack, where the dual has long flat runs
+    # of the duration multiplier close to its optimum
+    rng = np.random.default_rng(seed)
+    dfs = random_sector_dfs(make_universe, rng, int(rng.integers(5, 400)))
+    security_bound = float(rng.choice([0.01, 0.02, 0.05, 0.2]))
+    dur_target = float(rng.uniform(1, 12))
+    sector_bound = float(rng.uniform(0.1, 0.6))
+    args = (*dfs, security_bound, dur_target, sector_bound, "oas")
+    fast = do_optimization(*args)
+    cbc = do_optimization(*args, use_fast_path=False)
+    assert (fast is None) == (cbc is None)
+    if fast is None:
+        return
+    assert [x["shadow_price"] for x in fast[2]] == pytest.approx(
+        [x["shadow_price"] for x in cbc[2]], rel=1e-5, abs=1e-5
+    )
+
+
+def test_scenarios_match_reoptimizing(make_universe):
+    rng = np.random.default_rng(0)
+    dfs = random_sector_dfs(make_universe, rng, 300)
+    df = pd.concat(dfs)
+    df["rating"] = rng.choice(["AAA", "AA", "A", "BBB"], len(df))
+    scenarios = parse_scenarios(
+        "Financials: FINANCIAL=+50\nCredit: BBB=+40, a=-10, BBB=+5\nALL=-500",
+        [*SECTORS, "AAA", "AA", "A", "BBB"],
+    )
+    assert scenarios[1].shifts == {"BBB": 45.0, "A": -10.0}
+    assert scenarios[2].name == "Scenario 3"
+    results = run_scenarios(df, scenarios, 0.03, 5.0, 0.35, "oas")
+    assert list(results["scenario"]) == ["Base", "Financials", "Credit", "Scenario 3"]
+    shifts = shock_matrix(df, scenarios)
+    for i, scenario in enumerate(scenarios):
+        shocked = df.assign(oas=np.maximum(df["oas"] + shifts[i], 0))
+        expected = do_optimization(
+            *[shocked[shocked["class_2"] == x] for x in SECTORS],
+            0.03,
+            5.0,
+            0.35,
+            "oas",
+            use_fast_path=False,
+        )
+        # pulp reports an all zero objective as None
+        expected_objective = expected[0] or 0.0
+        row = results.iloc[i + 1]
+        assert row["objective"] == pytest.approx(expected_objective, rel=1e-6)
+        assert row["objective_change"] == pytest.approx(
+            expected_objective - results.iloc[0]["objective"], rel=1e-6, abs=1e-6
+        )
+        assert row["effdur"] == pytest.approx(5.0)
+    # Everything floored at zero spread leaves nothing to earn
+    assert results.iloc[3]["objective"] == pytest.approx(0)
+    with pytest.raises(ValueError):
+        parse_scenarios("Typo: FINANCIALS=+50", SECTORS)
+
+
+def random_sector_dfs(make_universe, rng: np.random.Generator, n: int) -> list:
+    df = make_universe(n, rng, ["cusip", "oas", "ytm", "effdur", "class_2"])
+    return [df[df["class_2"] == x] for x in ["INDUSTRIAL", "FINANCIAL", "UTILITY"]]
+
+
 @pytest.fixture
 def single_date_data() -> pd.DataFrame:
     df = pd.read_csv("data/universe.csv")
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from proj.portfolio_analytics import (
+    ANALYTICS_MEASURES,
+    HOLDING_COLUMNS,
+    portfolio_analytics,
+    sector_tables,
+)
+
+SECTORS = ["INDUSTRIAL", "FINANCIAL", "UTILITY"]
+ORDERS = {"rating": {"AAA": 0, "AA": 1, "A": 2, "BBB": 3}}
+
+
+def test_analytics_match_naive_computation(universe: pd.DataFrame):
+    rng = np.random.default_rng(3)
+    picks = universe.sample(40, random_state=3)
+    cusip_wts = list(zip(picks["cusip"], rng.uniform(0, 0.02, 40)))
+    # Zero weights and bonds outside the universe aren't holdings
+    cusip_wts += [(universe["cusip"].iloc[0], 0.0), ("MISSING", 0.5)]
+    result = portfolio_analytics(universe, cusip_wts, SECTORS, orders=ORDERS)
+
+    held = universe.merge(
+        pd.DataFrame(cusip_wts, columns=["cusip", "wts"]).query("wts > 0")
+    )
+    assert len(result.holdings) == len(held) == 40
+    assert result.cash_wt == pytest.approx(1 - held["wts"].sum())
+    for measure in ["oas", "ytm", "effdur"]:
+        assert result.characteristics[measure] == pytest.approx(
+            (held[measure] * held["wts"]).sum() / held["wts"].sum()
+        )
+    assert result.sector_wts == pytest.approx(
+        {x: held.loc[held["class_2"] == x, "wts"].sum() for x in SECTORS}
+    )
+    for dimension, part in result.contributions.groupby("dimension"):
+        # Every dimension splits the whole portfolio
+        assert part["wt"].sum() == pytest.approx(held["wts"].sum())
+        assert part["oas"].sum() == pytest.approx((held["oas"] * held["wts"]).sum())
+        expected = held.groupby(dimension)["wts"].sum()
+        assert part.set_index("group")["wt"].to_dict() == pytest.approx(
+            expected.to_dict()
+        )
+    ratings = result.contributions.query("dimension == 'rating'")["group"]
+    assert list(ratings) == sorted(ratings, key=ORDERS["rating"].get)
+    assert list(result.holdings["wts"]) == sorted(result.holdings["wts"], reverse=True)
+
+
+def test_sector_tables_end_in_totals(universe: pd.DataFrame):
+    financials = universe[universe["class_2"] == "FINANCIAL"]
+    cusip_wts = [(x, 0.01) for x in financials["cusip"].iloc[:3]]
+    result = portfolio_analytics(universe, cusip_wts, SECTORS)
+    industrial, financial, utility = sector_tables(result, SECTORS)
+    assert list(financial.columns) == HOLDING_COLUMNS
+    assert len(financial) == 4
+    assert financial.iloc[-1]["mat_dt"] == "Total"
+    assert financial.iloc[-1]["wts"] == pytest.approx(0.03)
+    assert len(industrial) == len(utility) == 1
+    assert industrial.iloc[-1]["wts"] == 0
+    assert result.cash_wt == pytest.approx(0.97)
+
+
+def test_empty_portfolio(universe: pd.DataFrame):
+    result = portfolio_analytics(universe, [], SECTORS)
+    assert result.holdings.empty and result.contributions.empty
+    assert result.cash_wt == 1
+    assert result.characteristics == {"oas": None, "ytm": None, "effdur": None}
+    assert [len(x) for x in sector_tables(result, SECTORS)] == [1, 1, 1]
+
+
+@pytest.fixture
+def universe(make_universe) -> pd.DataFrame:
+    return make_universe(
+        200,
+        0,
+        [
+            "cusip",
+            "ticker",
+            "mat_dt",
+            "class_2",
+            "rating",
+            "dur_cell",
+            *ANALYTICS_MEASURES,
+        ],
+    )
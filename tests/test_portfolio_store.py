@@ -0,0 +1,126 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
+from proj.db_structure import build_portfolio_models
+from proj.portfolio_store import (
+    PortfolioStore,
+    diff_portfolios,
+    diff_summary,
+    register_portfolio_routes,
+)
+
+
+def test_diff_portfolios_labels_every_position():
+    old = pd.DataFrame({"cusip": ["A", "B", "C", "D"], "wt": [0.02, 0.01, 0.02, 0.01]})
+    new = pd.DataFrame({"cusip": ["B", "C", "D", "E"], "wt": [0.01, 0.005, 0.02, 0.03]})
+    diff = diff_portfolios(old, new).set_index("cusip")
+    assert diff["status"].to_dict() == {
+        "E": "added",
+        "A": "removed",
+        "C": "resized",
+        "D": "resized",
+        "B": "unchanged",
+    }
+    assert list(diff.index) == ["E", "A", "C", "D", "B"]
+    assert diff.loc["A", "wt_new"] == 0 and diff.loc["E", "wt_old"] == 0
+    assert diff.loc["C", "change"] == pytest.approx(-0.015)
+    counts = diff_summary(diff.reset_index())
+    assert counts["added"] == 1 and counts["unchanged"] == 1
+    assert counts["turnover"] == pytest.approx((0.03 + 0.02 + 0.015 + 0.01) / 2)
+
+
+def test_save_load_and_diff_runs(store: PortfolioStore):
+    first = store.save_run(
+        dt.date(2020, 2, 29),
+        {"class_2": ["FINANCIAL"], "rating": None},
+        "oas",
+        0.02,
+        5,
+        0.35,
+        310.5,
+        [("A", 0.02), ("B", 0.0), ("C", 0.01)],
+    )
+    second = store.save_run(
+        dt.date(2020, 3, 31),
+        {"class_2": ["FINANCIAL"], "rating": None},
+        "oas",
+        0.02,
+        5,
+        0.35,
+        305.0,
+        [("A", 0.02), ("C", 0.015), ("D", 0.01)],
+        risk_mode="volatility",
+        risk_cap=120,
+    )
+    run, holdings = store.load_run(first)
+    assert run["objective"] == 310.5 and run["risk_cap"] is None
+    assert run["filters"] == {"class_2": ["FINANCIAL"], "rating": None}
+    # Zero weights aren't stored
+    assert sorted(holdings["cusip"]) == ["A", "C"]
+    assert [x["run_id"] for x in store.list_runs()] == [second, first]
+    diff = store.diff_runs(first, second).set_index("cusip")
+    assert diff["status"].to_dict() == {
+        "D": "added",
+        "C": "resized",
+        "A": "unchanged",
+    }
+    with pytest.raises(KeyError):
+        store.load_run(second + 1)
+
+
+def test_save_run_without_bound_or_objective(store: PortfolioStore):
+    # No per-security cap, and PuLP's None for an all zero objective
+    run_id = store.save_run(
+        dt.date(2020, 2, 29), {}, "oas", None, 5, 0.35, None, [("A", 0.0)]
+    )
+    run, holdings = store.load_run(run_id)
+    assert run["security_bound"] is None and run["objective"] == 0
+    assert holdings.empty
+
+
+def test_failed_save_leaves_session_usable(store: PortfolioStore):
+    # A duplicate cusip breaks the holdings primary key
+    with pytest.raises(IntegrityError):
+        store.save_run(
+            dt.date(2020, 2, 29), {}, "oas", 0.02, 5, 0.35, 1.0, [("A", 0.01)] * 2
+        )
+    assert store.list_runs() == []
+    store.save_run(dt.date(2020, 2, 29), {}, "oas", 0.02, 5, 0.35, 1.0, [("A", 0.01)])
+    assert len(store.list_runs()) == 1
+
+
+def test_portfolio_routes(app: Flask, store: PortfolioStore):
+    register_portfolio_routes(app, store)
+    ids = [
+        store.save_run(dt.date(2020, 2, 29), {}, "ytm", 0.02, 5, 0.35, 4.0, x)
+        for x in [[("A", 0.02)], [("A", 0.01), ("B", 0.02)]]
+    ]
+    client = app.test_client()
+    assert len(client.get("/portfolios?limit=1").get_json()) == 1
+    assert client.get(f"/portfolios/{ids[0]}").get_json()["holdings"] == [
+        {"cusip": "A", "wt": 0.02}
+    ]
+    diff = client.get(f"/portfolios/{ids[0]}/diff/{ids[1]}").get_json()
+    assert diff["added"] == 1 and diff["resized"] == 1
+    assert client.get("/portfolios/999").status_code == 404
+
+
+@pytest.fixture
+def app() -> Flask:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    return app
+
+
+@pytest.fixture
+def store(app: Flask) -> PortfolioStore:
+    db = SQLAlchemy(app)
+    with app.app_context():
+        store = PortfolioStore(db, *build_portfolio_models(db))
+        store.create_tables()
+        yield store
@@ -0,0 +1,88 @@
+import json
+import time
+
+from flask import Flask, request
+from sqlalchemy import create_engine, text
+from proj.profiler import RequestProfiler
+
+
+def test_header_and_flag_capture_cprofile_and_sql(tmp_path):
+    app, engine = _app(tmp_path, RequestProfiler(str(tmp_path)))
+    client = app.test_client()
+    client.get("/work")
+    assert not list(tmp_path.iterdir())
+    client.post(
+        "/work",
+        json={"output": "..opt_summary.data...opt_summary.columns.."},
+        headers={"X-Profile": "1"},
+    )
+    client.get("/work?profile")
+    traces = client.get("/profiles").get_json()
+    assert [x["trigger"] for x in traces] == ["cprofile", "cprofile"]
+    assert traces[1]["callback"] == "opt_summary"
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+    trace = client.get(f"/profiles/{traces[1]['name']}").get_json()
+    assert [x["statement"] for x in trace["sql"]] == ["SELECT 1", "SELECT 2"]
+    assert trace["sql"][1]["start_ms"] >= trace["sql"][0]["start_ms"]
+    assert any("_slow_python" in x["function"] for x in trace["functions"])
+    assert client.get("/profiles/../secret.json").status_code == 404
+
+
+def test_threshold_samples_only_slow_requests(tmp_path):
+    app, _ = _app(tmp_path, RequestProfiler(str(tmp_path), threshold_ms=30))
+    client = app.test_client()
+    client.get("/work")
+    assert client.get("/profiles").get_json() == []
+    client.get("/work?sleep=0.15")
+    (trace,) = client.get("/profiles").get_json()
+    assert trace["trigger"] == "sampled" and trace["duration_ms"] >= 150
+    with open(tmp_path / trace["name"]) as f:
+        record = json.load(f)
+    assert len(record["sql"]) == 2
+    assert record["stacks"][0]["stack"].split(";")[-1].startswith("work (")
+
+
+def test_rotation_keeps_newest(tmp_path):
+    app, _ = _app(tmp_path, RequestProfiler(str(tmp_path), max_traces=3))
+    client = app.test_client()
+    for _ in range(5):
+        client.get("/work?profile")
+    assert len(list(tmp_path.glob("*.json"))) == 3
+    assert len(list(tmp_path.glob("*.prof"))) == 3
+
+
+def test_on_demand_profiles_need_debug_or_config(tmp_path):
+    app, _ = _app(tmp_path, RequestProfiler(str(tmp_path)))
+    app.config["PROFILE_ENABLED"] = False
+    client = app.test_client()
+    client.get("/work?profile")
+    client.get("/work", headers={"X-Profile": "1"})
+    assert not list(tmp_path.iterdir())
+    assert client.get("/profiles").status_code == 404
+    app.debug = True
+    client.get("/work?profile")
+    (name,) = [x.name for x in tmp_path.glob("*.json")]
+    assert client.get(f"/profiles/{name}").status_code == 200
+    app.debug = False
+    assert client.get(f"/profiles/{name}").status_code == 404
+
+
+def _slow_python() -> int:
+    return sum(i * i for i in range(20_000))
+
+
+def _app(tmp_path, profiler: RequestProfiler):
+    app = Flask(__name__)
+    app.config["PROFILE_ENABLED"] = True
+    engine = create_engine("sqlite://")
+    profiler.init_app(app, engine)
+
+    @app.route("/work", methods=["GET", "POST"])
+    def work() -> str:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            time.sleep(float(request.args.get("sleep", 0)))
+            conn.execute(text("SELECT 2"))
+        return str(_slow_python())
+
+    return app, engine
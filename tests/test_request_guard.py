@@ -0,0 +1,177 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from dash.exceptions import PreventUpdate
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import OperationalError
+from proj.request_guard import RequestGuard, Superseded
+
+
+def test_newer_request_supersedes_older(guard: RequestGuard):
+    first = guard.begin("tab", "summary_table")
+    assert guard.is_current("tab", "summary_table", first)
+    second = guard.begin("tab", "summary_table")
+    # Other tabs and other callbacks of the same tab are independent
+    guard.begin("other tab", "summary_table")
+    guard.begin("tab", "summary_history")
+    with pytest.raises(PreventUpdate):
+        guard.check("tab", "summary_table", first)
+    guard.check("tab", "summary_table", second)
+    with pytest.raises(Superseded):
+        with guard.statement("tab", "summary_table", first):
+            pass
+    with guard.statement("tab", "summary_table", second):
+        pass
+    assert guard.dropped == 2
+    # No session id, no sequencing
+    assert guard.begin(None, "summary_table") == 0
+    guard.check(None, "summary_table", 0)
+
+
+def test_debounce_runs_only_the_last_change(guard: RequestGuard):
+    results = []
+
+    def request(i: int) -> None:
+        try:
+            guard.begin("tab", "summary_history", debounce=0.2)
+            results.append(i)
+        except Superseded:
+            pass
+
+    threads = []
+    for i in range(5):
+        threads.append(threading.Thread(target=request, args=(i,)))
+        threads[-1].start()
+        threads[-1].join(0.02)
+    for thread in threads:
+        thread.join()
+    assert results == [4]
+
+
+def test_superseded_debounce_returns_early(guard: RequestGuard):
+    finished = []
+
+    def request() -> None:
+        with pytest.raises(Superseded):
+            guard.begin("tab", "summary_history", debounce=5)
+        finished.append(time.perf_counter())
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    thread.join(0.05)
+    start = time.perf_counter()
+    guard.begin("tab", "summary_history")
+    thread.join(1)
+    assert finished and finished[0] - start < 1
+
+
+def test_slots_are_bounded(db: SQLAlchemy):
+    guard = RequestGuard(db, max_slots=3)
+    seqs = [guard.begin(f"tab {i}", "summary_table") for i in range(5)]
+    assert len(guard._slots) == 3
+    guard.check("tab 4", "summary_table", seqs[-1])
+
+
+def test_postgres_statements_are_timed_out_and_cancelled():
+    db = postgres_db(backend_pid=4242)
+    guard = RequestGuard(db, statement_timeout_ms=5000)
+    first = guard.begin("tab", "summary_table")
+    with guard.statement("tab", "summary_table", first):
+        session_connection = db.session.connection.return_value
+        assert executed_sql(session_connection) == [
+            ("SET LOCAL statement_timeout = 5000", None)
+        ]
+        # A newer request cancels the backend still running the first one
+        guard.begin("tab", "summary_table")
+        cancel_connection = db.engine.connect.return_value.__enter__.return_value
+        assert executed_sql(cancel_connection) == [
+            ("SELECT pg_cancel_backend(:pid)", {"pid": 4242})
+        ]
+    assert guard.cancelled == 1
+    # Once the statement is done its backend is free for other requests
+    guard.begin("tab", "summary_table")
+    assert guard.cancelled == 1
+
+
+def test_slow_cancel_blocks_only_the_cancelled_statement():
+    db = postgres_db(backend_pid=4242)
+    guard = RequestGuard(db)
+    cancelling, release = threading.Event(), threading.Event()
+
+    def slow_cancel(*args):
+        cancelling.set()
+        release.wait(5)
+
+    cancel_connection = db.engine.connect.return_value.__enter__.return_value
+    cancel_connection.execute.side_effect = slow_cancel
+    first = guard.begin("tab", "summary_table")
+    statement = guard.statement("tab", "summary_table", first)
+    statement.__enter__()
+    canceller = threading.Thread(target=guard.begin, args=("tab", "summary_table"))
+    canceller.start()
+    assert cancelling.wait(5)
+    # The session's other requests go on while the cancel is in flight
+    latest = guard.begin("tab", "summary_table")
+    guard.check("tab", "summary_table", latest)
+    # The cancelled request keeps its connection until the cancel has landed
+    finished = threading.Event()
+
+    def finish() -> None:
+        statement.__exit__(None, None, None)
+        finished.set()
+
+    threading.Thread(target=finish).start()
+    assert not finished.wait(0.1)
+    release.set()
+    assert finished.wait(5)
+    canceller.join(5)
+
+
+def test_cancelled_postgres_statement_is_superseded():
+    db = postgres_db(backend_pid=4242)
+    guard = RequestGuard(db)
+    canceled = OperationalError("SELECT", {}, mock.Mock(pgcode="57014"))
+    first = guard.begin("tab", "summary_table")
+    with pytest.raises(Superseded):
+        with guard.statement("tab", "summary_table", first):
+            guard.begin("tab", "summary_table")
+            raise canceled
+    db.session.rollback.assert_called_once()
+    # Still the latest request, so it was the statement_timeout: a real error
+    latest = guard.begin("tab", "summary_table")
+    with pytest.raises(OperationalError):
+        with guard.statement("tab", "summary_table", latest):
+            raise canceled
+
+
+def postgres_db(backend_pid: int) -> mock.MagicMock:
+    db = mock.MagicMock()
+    db.engine.dialect.name = "postgresql"
+    connection = db.session.connection.return_value
+    connection.connection.get_backend_pid.return_value = backend_pid
+    return db
+
+
+def executed_sql(connection: mock.MagicMock) -> list:
+    return [
+        (str(x.args[0]), x.args[1] if len(x.args) > 1 else None)
+        for x in connection.execute.call_args_list
+    ]
+
+
+@pytest.fixture
+def db() -> SQLAlchemy:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db = SQLAlchemy(app)
+    with app.app_context():
+        yield db
+
+
+@pytest.fixture
+def guard(db: SQLAlchemy) -> RequestGuard:
+    return RequestGuard(db)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from proj.optimization import do_optimization
+from proj.risk_model import FactorRiskModel
+
+
+def test_variance_matches_dense_covariance(universe: pd.DataFrame):
+    model = FactorRiskModel.from_universe(universe)
+    cov = model.exposures @ model.factor_cov @ model.exposures.T + np.diag(
+        model.specific_var
+    )
+    wts = np.random.default_rng(2).uniform(0, 1, len(universe))
+    assert model.variance(wts) == pytest.approx(wts @ cov @ wts)
+    assert model.benchmark.sum() == pytest.approx(1)
+
+
+@pytest.mark.parametrize("tracking_error", [False, True])
+def test_risk_cap_is_respected(universe: pd.DataFrame, tracking_error: bool):
+    sector_dfs = [
+        universe[universe["class_2"] == x]
+        for x in ["INDUSTRIAL", "FINANCIAL", "UTILITY"]
+    ]
+    model = FactorRiskModel.from_universe(pd.concat(sector_dfs))
+    benchmark = model.benchmark if tracking_error else 0
+    unconstrained, wts, _, _ = do_optimization(*sector_dfs, 0.02, 5, 0.4, "oas")
+    risk = model.volatility(np.array([wt for _, wt in wts]) - benchmark)
+    # Between the unconstrained risk and the (infeasible) floor set by duration
+    risk_cap = 0.99 * risk
+    objective, wts, sensitivity, _ = do_optimization(
+        *sector_dfs,
+        0.02,
+        5,
+        0.4,
+        "oas",
+        risk_model=model,
+        risk_cap=risk_cap,
+        tracking_error=tracking_error,
+    )
+    wts = np.array([wt for _, wt in wts])
+    assert model.volatility(wts - benchmark) <= risk_cap * (1 + 1e-4)
+    assert objective <= unconstrained + 1e-6
+    assert sensitivity[-1]["constraint"] == "Risk cap (bp)"
+    assert sensitivity[-1]["shadow_price"] > 0
+    assert (wts >= 0).all() and (wts <= 0.02 + 1e-9).all()
+
+
+@pytest.fixture
+def universe(make_universe) -> pd.DataFrame:
+    return make_universe(
+        300, 5, ["cusip", "oas", "ytm", "effdur", "mv", "class_2", "rating"]
+    )
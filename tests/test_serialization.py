@@ -0,0 +1,140 @@
+import datetime as dt
+import json
+from decimal import Decimal
+
+import brotli
+import dash
+import dash_html_components as html
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from dash.dependencies import Input, Output
+from dash.exceptions import InvalidCallbackReturnValue, PreventUpdate
+from flask import Flask
+from plotly.utils import PlotlyJSONEncoder
+from proj.serialization import SerializingDash, dumps
+
+
+def test_dumps_matches_plotly_encoder():
+    payload = {
+        "rows": [
+            {
+                "cusip": "A",
+                "mat_dt": dt.date(2030, 1, 15),
+                "created": dt.datetime(2021, 6, 1, 12, 30),
+                "oas": Decimal("123.4567"),
+                "wts": np.float64(0.01),
+                "count": np.int64(3),
+                "ytm": float("nan"),
+            }
+        ],
+        "array": np.array([1.5, np.nan, 3.0]),
+        "strided": np.arange(6)[::2],
+        "series": pd.Series([1, 2]),
+        "figure": go.Figure(go.Scatter(x=[dt.date(2020, 1, 31)], y=[1.0])),
+        "component": html.Div("x", id="y"),
+    }
+    assert json.loads(dumps(payload)) == json.loads(
+        json.dumps(payload, cls=PlotlyJSONEncoder)
+    )
+
+
+def test_callbacks_are_encoded_compressed_and_recorded(app: SerializingDash):
+    client = app.server.test_client()
+    response = client.post(
+        "/_dash-update-component",
+        json=callback_body(5000),
+        headers={"Accept-Encoding": "br, gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["Server-Timing"].startswith("serialize;dur=")
+    body = json.loads(brotli.decompress(response.data))
+    rows = body["response"]["table"]["data"]
+    assert len(rows) == 5000
+    assert rows[0] == {"mat_dt": "2030-01-15", "oas": 1.25, "wt": 0.0}
+    # no_update outputs are left out
+    assert body["response"]["label"] == {"children": "5000 rows"}
+    assert "other" not in body["response"]
+
+    # Small responses aren't worth compressing
+    response = client.post(
+        "/_dash-update-component",
+        json=callback_body(1),
+        headers={"Accept-Encoding": "br, gzip"},
+    )
+    assert "Content-Encoding" not in response.headers
+    assert (
+        client.post("/_dash-update-component", json=callback_body(0)).status_code == 204
+    )
+
+    report = {x["callback"]: x for x in client.get("/payloads").get_json()}
+    stats = report["make_rows"]
+    assert stats["calls"] == 2
+    assert stats["wire_bytes"] < stats["json_bytes"]
+    assert stats["compression_ratio"] > 1
+
+
+def test_unserializable_values_get_dashs_error(app: SerializingDash):
+    app.server.testing = True
+    client = app.server.test_client()
+    body = {
+        "output": "bad.children",
+        "outputs": {"id": "bad", "property": "children"},
+        "inputs": [{"id": "rows", "property": "value", "value": 1}],
+        "changedPropIds": ["rows.value"],
+    }
+    with pytest.raises(InvalidCallbackReturnValue, match="bad"):
+        client.post("/_dash-update-component", json=body)
+
+
+def test_layout_is_served(app: SerializingDash):
+    client = app.server.test_client()
+    layout = client.get("/_dash-layout").get_json()
+    assert layout["props"]["id"] == "root"
+    assert "layout" in {x["callback"] for x in client.get("/payloads").get_json()}
+
+
+def callback_body(rows: int) -> dict:
+    outputs = [("table", "data"), ("label", "children"), ("other", "children")]
+    return {
+        "output": "..{}..".format("...".join(f"{i}.{p}" for i, p in outputs)),
+        "outputs": [{"id": i, "property": p} for i, p in outputs],
+        "inputs": [{"id": "rows", "property": "value", "value": rows}],
+        "changedPropIds": ["rows.value"],
+    }
+
+
+@pytest.fixture
+def app() -> SerializingDash:
+    app = SerializingDash(__name__, server=Flask(__name__))
+    app.layout = html.Div(
+        [html.Div(id=x) for x in ["rows", "table", "label", "other", "bad"]], id="root"
+    )
+
+    @app.callback(
+        (
+            Output("table", "data"),
+            Output("label", "children"),
+            Output("other", "children"),
+        ),
+        Input("rows", "value"),
+    )
+    def make_rows(rows):
+        if not rows:
+            raise PreventUpdate
+        frame = pd.DataFrame(
+            {
+                "mat_dt": [dt.date(2030, 1, 15)] * rows,
+                "oas": [Decimal("1.25")] * rows,
+                "wt": np.linspace(0, 1, rows),
+            }
+        )
+        return frame.to_dict("records"), f"{rows} rows", dash.no_update
+
+    @app.callback(Output("bad", "children"), Input("rows", "value"))
+    def make_bad(rows):
+        return {"rows": {rows}}
+
+    return app
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import Column, Date, Integer, Numeric, String, create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import declarative_base
+from proj.summary_stats import (
+    breakdown_tables,
+    stat_names,
+    summarize_arrays,
+    summary_figure,
+    summary_series_select,
+    summary_tables,
+    summarize_groups,
+)
+
+MEASURES = ["oas", "ytm", "effdur", "mv"]
+QUANTILES = [0.1, 0.5, 0.9]
+
+
+def test_summarize_arrays_matches_pandas(universe: pd.DataFrame):
+    result = summarize_arrays(
+        {x: universe[x].to_numpy() for x in MEASURES}, MEASURES, QUANTILES
+    )
+    rows, columns, totals, _ = summary_tables(result, MEASURES, QUANTILES)
+    assert [x["id"] for x in columns] == ["measure"] + [
+        x for _, x in stat_names(QUANTILES)
+    ]
+    for row, measure in zip(rows, MEASURES):
+        assert row["minimum"] == pytest.approx(universe[measure].min())
+        assert row["average"] == pytest.approx(universe[measure].mean())
+        assert row["median"] == pytest.approx(universe[measure].median())
+        assert row["p10"] == pytest.approx(universe[measure].quantile(0.1))
+        assert row["p90"] == pytest.approx(universe[measure].quantile(0.9))
+        assert row["maximum"] == pytest.approx(universe[measure].max())
+    assert totals == [
+        {
+            "num_bonds": len(universe),
+            "market_value": pytest.approx(universe["mv"].sum()),
+        }
+    ]
+
+
+def test_summarize_empty_gives_nulls():
+    empty = {x: np.array([]) for x in MEASURES}
+    rows, _, totals, _ = summary_tables(
+        summarize_arrays(empty, MEASURES, QUANTILES), MEASURES, QUANTILES
+    )
+    assert all(v is None for row in rows for k, v in row.items() if k != "measure")
+    assert totals == [{"num_bonds": 0, "market_value": None}]
+
+
+def test_summary_series_select_groups_by_date():
+    stmt = summary_series_select(Bond, [Bond.rating == "AA"], MEASURES, QUANTILES)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert sql.count("SELECT") == 1
+    assert "GROUP BY main_table.eff_date" in sql
+    assert len(stmt.selected_columns) == len(MEASURES) * (len(QUANTILES) + 3) + 3
+
+
+def test_summary_series_matches_per_date(universe: pd.DataFrame):
+    # sqlite has no percentile_cont, so run the grouped scan without quantiles
+    universe["eff_date"] = np.repeat(
+        pd.date_range("2020-01-31", periods=5, freq="M").date, len(universe) // 5
+    )
+    universe["rating"] = "AA"
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Bond.__table__.insert(), universe.to_dict("records"))
+        rows = list(
+            conn.execute(summary_series_select(Bond, [Bond.oas > 100], MEASURES, []))
+        )
+    filtered = universe[universe["oas"] > 100]
+    assert [row[0] for row in rows] == sorted(filtered["eff_date"].unique())
+    for row, (_, group) in zip(rows, filtered.groupby("eff_date")):
+        expected = summarize_arrays(group, MEASURES, [])
+        assert [float(x) for x in row[1:]] == pytest.approx(expected)
+
+    figure = summary_figure(rows, "ytm", MEASURES, [])
+    assert [trace["name"] for trace in figure["data"]] == ["Average"]
+    assert figure["data"][0]["y"] == pytest.approx([float(row[5]) for row in rows])
+    figure = summary_figure(rows, "count", MEASURES, [])
+    assert figure["data"][0]["y"] == [row[-1] for row in rows]
+
+
+def test_summarize_groups_matches_per_group(universe: pd.DataFrame):
+    rng = np.random.default_rng(3)
+    universe["rating"] = rng.choice(["AAA", "AA", "A", "BBB", "NR"], len(universe))
+    universe["eff_date"] = rng.choice(
+        pd.date_range("2020-01-31", periods=2, freq="M").date, len(universe)
+    )
+    grouped = {
+        row[:2]: row[2:]
+        for row in summarize_groups(universe, ["rating", "eff_date"], MEASURES)
+    }
+    assert len(grouped) == 10
+    assert summarize_groups(universe.iloc[:0], ["rating"], MEASURES) == []
+    for key, group in universe.groupby(["rating", "eff_date"]):
+        expected = summarize_arrays(group, MEASURES)
+        assert list(grouped[key]) == pytest.approx(expected)
+
+
+def test_breakdown_tables_sorts_by_display_order(universe: pd.DataFrame):
+    rng = np.random.default_rng(4)
+    universe["rating"] = rng.choice(["AAA", "BBB", "A", "NR"], len(universe))
+    universe["dur_cell"] = rng.choice(["15+", "0to3"], len(universe))
+    rows = summarize_groups(universe, ["dur_cell", "rating"])
+    data, columns = breakdown_tables(
+        rows,
+        ["dur_cell", "rating"],
+        {"rating": {"AAA": 0, "A": 2, "BBB": 3}, "dur_cell": {"0to3": 0, "15+": 5}},
+    )
+    assert [(x["dur_cell"], x["rating"]) for x in data] == [
+        (y, x) for y in ["0to3", "15+"] for x in ["AAA", "A", "BBB", "NR"]
+    ]
+    assert sum(x["num_bonds"] for x in data) == len(universe)
+    assert [x["id"] for x in columns][:4] == [
+        "dur_cell",
+        "rating",
+        "num_bonds",
+        "market_value",
+    ]
+    group = universe[(universe["dur_cell"] == "15+") & (universe["rating"] == "NR")]
+    assert data[-1]["oas_median"] == pytest.approx(group["oas"].median())
+    assert data[-1]["ytm_p75"] == pytest.approx(group["ytm"].quantile(0.75))
+
+
+Base = declarative_base()
+
+
+class Bond(Base):
+    __tablename__ = "main_table"
+    u_id = Column("id", Integer, primary_key=True)
+    eff_date = Column(Date)
+    rating = Column(String)
+    oas = Column(Numeric)
+    ytm = Column(Numeric)
+    effdur = Column(Numeric)
+    mv = Column(Numeric)
+
+
+@pytest.fixture
+def universe(make_universe) -> pd.DataFrame:
+    return make_universe(500, 0, MEASURES)